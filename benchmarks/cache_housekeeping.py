@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmark of the lock hold times of the cache housekeeper
+
+Compares the lock hold times of a full scan of the cache inventory
+against the expiration index based housekeeper and prints the
+results as JSON.
+
+Usage: python benchmarks/cache_housekeeping.py [items] [expired-ratio]
+
+"""
+
+from __future__ import print_function
+
+import os
+import sys
+import json
+import threading
+
+from time import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from vconnector.cache import CachedObject
+from vconnector.cache import CacheInventory
+
+
+class TimedLock(object):
+    """
+    Re-entrant lock recording the time it is being held
+
+    """
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._acquired = 0
+        self.hold_times = []
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            self._acquired = time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._depth -= 1
+        if self._depth == 0:
+            self.hold_times.append(time() - self._acquired)
+        self._lock.release()
+
+
+def full_scan_housekeeper(cache):
+    """
+    The housekeeper scanning all items while holding the lock
+
+    """
+    with cache.lock:
+        for item in list(cache._cache.values()):
+            cache._has_expired(item)
+
+
+def populate(items, expired_ratio):
+    cache = CacheInventory()
+    cache.lock = TimedLock()
+    expired = int(items * expired_ratio)
+
+    for i in range(items):
+        item = CachedObject(name='vim.VirtualMachine:vm-{}'.format(i), obj=i, ttl=300)
+        if i < expired:
+            item.timestamp -= 600
+        cache.add(item)
+
+    cache.lock.hold_times = []
+    return cache
+
+
+def run(name, housekeeper, items, expired_ratio):
+    cache = populate(items, expired_ratio)
+
+    start = time()
+    housekeeper(cache)
+    elapsed = time() - start
+
+    hold_times = cache.lock.hold_times
+    return {
+        'housekeeper': name,
+        'items': items,
+        'expired': items - len(cache._cache),
+        'elapsed': elapsed,
+        'lock_acquisitions': len(hold_times),
+        'max_lock_hold': max(hold_times) if hold_times else 0,
+        'total_lock_hold': sum(hold_times),
+    }
+
+
+def main():
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    expired_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.01
+
+    results = [
+        run('full-scan', full_scan_housekeeper, items, expired_ratio),
+        run('expiration-index', CacheInventory._housekeeper, items, expired_ratio),
+    ]
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
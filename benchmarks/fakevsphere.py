@@ -0,0 +1,353 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Fake VMware vSphere endpoint for benchmarks
+
+Provides a pyVmomi stub adapter answering the SOAP operations
+used by vConnector from a synthetic in-memory inventory, so that
+vConnector can be benchmarked without a vSphere host. An optional
+latency is added to each invoked operation to emulate the network
+round trips.
+
+"""
+
+import os
+import sys
+import threading
+import itertools
+
+from time import time
+from time import sleep
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pyVmomi
+
+from vconnector.core import VConnector
+
+__all__ = ['FakeInventory', 'FakeStubAdapter', 'fake_agent']
+
+
+class FakeInventory(object):
+    """
+    Synthetic inventory of managed objects and their properties
+
+    The inventory consists of datacenters, clusters, hosts,
+    datastores and virtual machines, where the hosts and
+    virtual machines are evenly distributed among the clusters
+    and hosts respectively.
+
+    """
+    def __init__(self, vms=1000, hosts=50, clusters=5, datastores=20, datacenters=1):
+        """
+        Initializes a new FakeInventory object
+
+        Args:
+            vms         (int): Number of virtual machines
+            hosts       (int): Number of hosts
+            clusters    (int): Number of clusters
+            datastores  (int): Number of datastores
+            datacenters (int): Number of datacenters
+
+        """
+        vim = pyVmomi.vim
+        self.objects = {}
+        self.properties = {}
+
+        self.root_folder = vim.Folder('group-d1')
+        self._add(self.root_folder, {'name': 'Datacenters'})
+
+        dcs = [
+            self._add(vim.Datacenter('datacenter-{}'.format(i)), {
+                'name': 'dc{:03d}'.format(i),
+                'parent': self.root_folder,
+            })
+            for i in range(datacenters)
+        ]
+
+        clusters = [
+            self._add(vim.ClusterComputeResource('domain-c{}'.format(i)), {
+                'name': 'cluster{:03d}'.format(i),
+                'parent': dcs[i % len(dcs)],
+            })
+            for i in range(clusters)
+        ]
+
+        hosts = [
+            self._add(vim.HostSystem('host-{}'.format(i)), {
+                'name': 'esxi{:05d}.example.org'.format(i),
+                'parent': clusters[i % len(clusters)],
+                'runtime.connectionState': 'connected',
+                'runtime.inMaintenanceMode': False,
+                'summary.hardware.numCpuCores': 32,
+                'summary.hardware.memorySize': 512 * 1024 ** 3,
+                'summary.quickStats.overallCpuUsage': (i * 37) % 64000,
+                'summary.quickStats.overallMemoryUsage': (i * 53) % 524288,
+            })
+            for i in range(hosts)
+        ]
+
+        for i in range(datastores):
+            self._add(vim.Datastore('datastore-{}'.format(i)), {
+                'name': 'datastore{:04d}'.format(i),
+                'summary.capacity': 16 * 1024 ** 4,
+                'summary.freeSpace': (i * 7919 % 16) * 1024 ** 4,
+                'summary.accessible': True,
+            })
+
+        for i in range(vms):
+            self._add(vim.VirtualMachine('vm-{}'.format(i)), {
+                'name': 'vm{:06d}'.format(i),
+                'runtime.host': hosts[i % len(hosts)],
+                'runtime.powerState': 'poweredOn' if i % 10 else 'poweredOff',
+                'config.uuid': '4210{:028x}'.format(i),
+                'config.hardware.numCPU': 1 << (i % 4),
+                'config.hardware.memoryMB': 1024 << (i % 5),
+                'summary.quickStats.overallCpuUsage': (i * 13) % 4000,
+                'summary.quickStats.guestMemoryUsage': (i * 17) % 16384,
+                'summary.storage.committed': i * 1024 ** 3,
+            })
+
+    def _add(self, obj, properties):
+        self.objects[obj._moId] = obj
+        self.properties[obj._moId] = properties
+        return obj
+
+    def objects_of_type(self, obj_type):
+        """
+        Get the managed objects of any of the given types
+
+        Args:
+            obj_type (list): List of managed object types
+
+        Returns:
+            A list of managed objects
+
+        """
+        obj_type = tuple(obj_type)
+        return [obj for obj in self.objects.values() if isinstance(obj, obj_type)]
+
+
+class FakeStubAdapter(object):
+    """
+    pyVmomi stub adapter answering SOAP operations from a FakeInventory
+
+    Supports the operations used by vConnector for retrieving
+    the service content, creating and destroying views, and
+    collecting properties with RetrievePropertiesEx(), including
+    traversal specs and paging.
+
+    """
+    def __init__(self, inventory, latency=0.0):
+        """
+        Initializes a new FakeStubAdapter object
+
+        Args:
+            inventory (FakeInventory): The inventory to answer from
+            latency           (float): Time in seconds added to each operation
+
+        """
+        vim = pyVmomi.vim
+        self.inventory = inventory
+        self.latency = latency
+        self.cookie = 'vmware_soap_session="fake"'
+        self.calls = 0
+
+        self.lock = threading.Lock()
+        self._views = {}
+        self._tokens = {}
+        self._ids = itertools.count(1)
+
+        self.content = vim.ServiceInstanceContent(
+            rootFolder=inventory.root_folder,
+            propertyCollector=pyVmomi.vmodl.query.PropertyCollector('propertyCollector', self),
+            viewManager=vim.view.ViewManager('ViewManager', self),
+            sessionManager=vim.SessionManager('SessionManager', self),
+            about=vim.AboutInfo(
+                name='Fake vCenter Server',
+                apiVersion='8.0',
+                instanceUuid='00000000-0000-0000-0000-000000000000'
+            )
+        )
+        self.session = vim.UserSession(key='fake', userName='fake')
+
+    def _next_id(self, prefix):
+        with self.lock:
+            return '{}-{}'.format(prefix, next(self._ids))
+
+    def InvokeMethod(self, mo, info, args):
+        if self.latency:
+            sleep(self.latency)
+        self.calls += 1
+
+        handler = getattr(self, '_op_' + info.wsdlName, None)
+        if handler is None:
+            raise NotImplementedError('Unsupported operation: {}'.format(info.wsdlName))
+
+        return handler(mo, *args)
+
+    def InvokeAccessor(self, mo, info):
+        if self.latency:
+            sleep(self.latency)
+        self.calls += 1
+
+        if isinstance(mo, pyVmomi.vim.SessionManager) and info.name == 'currentSession':
+            return self.session
+
+        return self._get_property(mo, info.name)
+
+    def DropConnections(self):
+        pass
+
+    def _get_property(self, mo, path):
+        if isinstance(mo, pyVmomi.vim.view.ManagedObjectView) and path == 'view':
+            return list(self._views.get(mo._moId, []))
+
+        return self.inventory.properties.get(mo._moId, {}).get(path)
+
+    def _op_RetrieveServiceContent(self, mo):
+        return self.content
+
+    def _op_Logout(self, mo):
+        return None
+
+    def _op_CreateContainerView(self, mo, container, type, recursive):
+        view_ref = pyVmomi.vim.view.ContainerView(self._next_id('session[fake]containerview'), self)
+        self._views[view_ref._moId] = self.inventory.objects_of_type(type)
+        return view_ref
+
+    def _op_CreateListView(self, mo, obj=None):
+        view_ref = pyVmomi.vim.view.ListView(self._next_id('session[fake]listview'), self)
+        self._views[view_ref._moId] = list(obj or [])
+        return view_ref
+
+    def _op_DestroyView(self, mo):
+        self._views.pop(mo._moId, None)
+
+    def _traverse(self, obj, select_set, named, seen, result):
+        for spec in select_set or []:
+            if not isinstance(spec, pyVmomi.vmodl.query.PropertyCollector.TraversalSpec):
+                spec = named[spec.name]
+
+            if not isinstance(obj, spec.type):
+                continue
+
+            targets = self._get_property(obj, spec.path)
+            if targets is None:
+                continue
+            if not isinstance(targets, list):
+                targets = [targets]
+
+            for target in targets:
+                if not spec.skip and target._moId not in seen:
+                    seen.add(target._moId)
+                    result.append(target)
+                self._traverse(target, spec.selectSet, named, seen, result)
+
+    def _collect(self, spec_set):
+        PropertyCollector = pyVmomi.vmodl.query.PropertyCollector
+        objects = []
+
+        for filter_spec in spec_set:
+            found = []
+            seen = set()
+            for obj_spec in filter_spec.objectSet:
+                named = {}
+                stack = list(obj_spec.selectSet or [])
+                while stack:
+                    spec = stack.pop()
+                    if isinstance(spec, PropertyCollector.TraversalSpec):
+                        named[spec.name] = spec
+                        stack.extend(spec.selectSet or [])
+
+                if not obj_spec.skip and obj_spec.obj._moId not in seen:
+                    seen.add(obj_spec.obj._moId)
+                    found.append(obj_spec.obj)
+                self._traverse(obj_spec.obj, obj_spec.selectSet, named, seen, found)
+
+            for obj in found:
+                prop_specs = [s for s in filter_spec.propSet if isinstance(obj, s.type)]
+                if not prop_specs:
+                    continue
+
+                properties = self.inventory.properties.get(obj._moId, {})
+                prop_set = []
+                for prop_spec in prop_specs:
+                    paths = properties.keys() if prop_spec.all else prop_spec.pathSet
+                    for path in paths:
+                        if path in properties:
+                            prop_set.append(
+                                pyVmomi.vmodl.DynamicProperty(name=path, val=properties[path])
+                            )
+
+                objects.append(PropertyCollector.ObjectContent(obj=obj, propSet=prop_set))
+
+        return objects
+
+    def _page(self, objects, max_objects):
+        PropertyCollector = pyVmomi.vmodl.query.PropertyCollector
+
+        if not max_objects or len(objects) <= max_objects:
+            return PropertyCollector.RetrieveResult(objects=objects)
+
+        token = self._next_id('token')
+        self._tokens[token] = (objects[max_objects:], max_objects)
+        return PropertyCollector.RetrieveResult(token=token, objects=objects[:max_objects])
+
+    def _op_RetrievePropertiesEx(self, mo, specSet, options):
+        objects = self._collect(specSet)
+        if not objects:
+            return None
+        return self._page(objects, options.maxObjects)
+
+    def _op_ContinueRetrievePropertiesEx(self, mo, token):
+        objects, max_objects = self._tokens.pop(token)
+        return self._page(objects, max_objects)
+
+    def _op_CancelRetrievePropertiesEx(self, mo, token):
+        self._tokens.pop(token, None)
+
+
+def fake_agent(inventory, latency=0.0, **kwargs):
+    """
+    Create a VConnector connected to a fake vSphere endpoint
+
+    Args:
+        inventory (FakeInventory): The inventory to answer from
+        latency           (float): Time in seconds added to each operation
+
+    Any other keyword arguments are passed to VConnector.
+
+    Returns:
+        A VConnector instance
+
+    """
+    agent = VConnector(user='fake', pwd='fake', host='fake', **kwargs)
+    stub = FakeStubAdapter(inventory=inventory, latency=latency)
+    agent.instrumentation.wrap_stub(stub)
+    agent._si = pyVmomi.vim.ServiceInstance('ServiceInstance', stub)
+    agent._session_checked = time()
+
+    return agent
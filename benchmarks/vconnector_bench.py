@@ -0,0 +1,329 @@
+#!/usr/bin/env python
+#
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Benchmarks of vConnector against a fake vSphere endpoint
+
+Measures the throughput and latency of property collection,
+cached and uncached lookups, view creation and the cache
+inventory under concurrent access, using a synthetic inventory
+served by a fake pyVmomi stub adapter.
+
+The results are printed as JSON and optionally appended as a
+single line to a file, so that they can be tracked over time.
+
+Usage: python benchmarks/vconnector_bench.py --help
+
+"""
+
+from __future__ import print_function
+
+import sys
+import json
+import random
+import platform
+import argparse
+import threading
+
+from time import time
+
+import pyVmomi
+
+from fakevsphere import FakeInventory
+from fakevsphere import fake_agent
+
+from vconnector.cache import CachedObject
+from vconnector.cache import CacheInventory
+from vconnector.cache import ShardedCacheInventory
+
+
+def summarize(latencies, elapsed, objects=None):
+    """
+    Summarize the latencies of the measured operations
+
+    Args:
+        latencies (list): Latency in seconds of each operation
+        elapsed  (float): Total time in seconds of all operations
+        objects    (int): Total number of returned objects
+
+    Returns:
+        A dict with the throughput and latency percentiles
+
+    """
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def percentile(p):
+        return latencies[min(count - 1, int(count * p))] if count else 0.0
+
+    result = {
+        'count': count,
+        'elapsed': elapsed,
+        'ops_per_sec': count / elapsed if elapsed else 0.0,
+        'latency_mean': sum(latencies) / count if count else 0.0,
+        'latency_p50': percentile(0.50),
+        'latency_p95': percentile(0.95),
+        'latency_p99': percentile(0.99),
+        'latency_max': latencies[-1] if count else 0.0,
+    }
+
+    if objects is not None:
+        result['objects'] = objects
+        result['objects_per_sec'] = objects / elapsed if elapsed else 0.0
+
+    return result
+
+
+def measure(func, iterations):
+    """
+    Measure the latency of a function called repeatedly
+
+    Args:
+        func   (callable): The function to call, returning the
+                           number of objects it processed
+        iterations  (int): Number of calls
+
+    Returns:
+        A dict with the throughput and latency percentiles
+
+    """
+    latencies = []
+    objects = 0
+    start = time()
+    for _ in range(iterations):
+        t = time()
+        objects += func() or 0
+        latencies.append(time() - t)
+
+    return summarize(latencies, time() - start, objects)
+
+
+def soap_calls(agent, func):
+    """
+    Wrap a function to also count the SOAP operations it invokes
+
+    """
+    stub = agent._si._stub
+
+    def wrapper():
+        before = stub.calls
+        result = func()
+        wrapper.calls += stub.calls - before
+        return result
+
+    wrapper.calls = 0
+    return wrapper
+
+
+def bench_collection(inventory, args):
+    agent = fake_agent(inventory, latency=args.latency)
+    view_ref = agent.get_vm_view()
+
+    def collect():
+        return len(agent.collect_properties(
+            view_ref=view_ref,
+            obj_type=pyVmomi.vim.VirtualMachine,
+            path_set=['name', 'runtime.powerState', 'runtime.host'],
+            page_size=args.page_size
+        ))
+
+    func = soap_calls(agent, collect)
+    result = measure(func, args.repeat)
+    result['soap_calls'] = func.calls
+    view_ref.DestroyView()
+
+    return result
+
+
+def bench_view_creation(inventory, args):
+    agent = fake_agent(inventory, latency=args.latency)
+
+    def create():
+        view_ref = agent.get_container_view(obj_type=[pyVmomi.vim.VirtualMachine])
+        view_ref.DestroyView()
+        return 1
+
+    return measure(create, args.repeat * 10)
+
+
+def bench_lookups(inventory, args, names, **kwargs):
+    agent = fake_agent(inventory, latency=args.latency, **kwargs)
+
+    def lookup():
+        obj = agent.get_object_by_property(
+            property_name='name',
+            property_value=random.choice(names),
+            obj_type=pyVmomi.vim.VirtualMachine
+        )
+        return 1 if obj is not None else 0
+
+    func = soap_calls(agent, lookup)
+    # Warm up the cache, index and views
+    for name in names:
+        agent.get_object_by_property('name', name, pyVmomi.vim.VirtualMachine)
+
+    result = measure(func, args.lookups)
+    result['soap_calls'] = func.calls
+    agent.disconnect(logout=False)
+
+    return result
+
+
+def bench_uncached_lookups(inventory, args, names):
+    agent = fake_agent(inventory, latency=args.latency)
+
+    def lookup():
+        obj = agent.get_object_by_property(
+            property_name='name',
+            property_value=random.choice(names),
+            obj_type=pyVmomi.vim.VirtualMachine
+        )
+        return 1 if obj is not None else 0
+
+    func = soap_calls(agent, lookup)
+    result = measure(func, args.repeat)
+    result['soap_calls'] = func.calls
+    agent.disconnect(logout=False)
+
+    return result
+
+
+def bench_cache_contention(cache, args):
+    keys = ['key-{}'.format(i) for i in range(args.cache_items)]
+    for key in keys:
+        cache.add(CachedObject(name=key, obj=key, ttl=3600))
+
+    operations = args.lookups
+    latencies = [[] for _ in range(args.threads)]
+    barrier = threading.Event()
+
+    def worker(n):
+        rnd = random.Random(n)
+        observed = latencies[n]
+        barrier.wait()
+        for i in range(operations):
+            key = rnd.choice(keys)
+            t = time()
+            if i % 10:
+                cache.get(key)
+            else:
+                cache.add(CachedObject(name=key, obj=key, ttl=3600))
+            observed.append(time() - t)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(args.threads)]
+    for t in threads:
+        t.start()
+
+    start = time()
+    barrier.set()
+    for t in threads:
+        t.join()
+    elapsed = time() - start
+
+    result = summarize([l for observed in latencies for l in observed], elapsed)
+    result['threads'] = args.threads
+
+    return result
+
+
+BENCHMARKS = (
+    'collection',
+    'view_creation',
+    'uncached_lookup',
+    'cached_lookup',
+    'indexed_lookup',
+    'cache_contention',
+    'sharded_cache_contention',
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='vConnector benchmarks')
+    parser.add_argument('--vms', type=int, default=10000, help='number of virtual machines')
+    parser.add_argument('--hosts', type=int, default=500, help='number of hosts')
+    parser.add_argument('--clusters', type=int, default=20, help='number of clusters')
+    parser.add_argument('--datastores', type=int, default=100, help='number of datastores')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='latency in seconds added to each SOAP operation')
+    parser.add_argument('--page-size', type=int, default=1000,
+                        help='max number of objects per collected page')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of collections and uncached lookups')
+    parser.add_argument('--lookups', type=int, default=10000,
+                        help='number of cached lookups and cache operations per thread')
+    parser.add_argument('--threads', type=int, default=8,
+                        help='number of threads accessing the cache')
+    parser.add_argument('--cache-items', type=int, default=10000,
+                        help='number of items in the cache for the contention benchmarks')
+    parser.add_argument('--only', action='append', choices=BENCHMARKS,
+                        help='run only the given benchmark, may be repeated')
+    parser.add_argument('--output', help='append the results as a JSON line to this file')
+    args = parser.parse_args()
+
+    random.seed(0)
+    inventory = FakeInventory(
+        vms=args.vms,
+        hosts=args.hosts,
+        clusters=args.clusters,
+        datastores=args.datastores
+    )
+    names = ['vm{:06d}'.format(i) for i in range(0, args.vms, max(1, args.vms // 100))]
+
+    benchmarks = {
+        'collection': lambda: bench_collection(inventory, args),
+        'view_creation': lambda: bench_view_creation(inventory, args),
+        'uncached_lookup': lambda: bench_uncached_lookups(inventory, args, names),
+        'cached_lookup': lambda: bench_lookups(inventory, args, names, cache_enabled=True),
+        'indexed_lookup': lambda: bench_lookups(inventory, args, names, index_enabled=True),
+        'cache_contention': lambda: bench_cache_contention(CacheInventory(), args),
+        'sharded_cache_contention': lambda: bench_cache_contention(ShardedCacheInventory(), args),
+    }
+
+    results = {}
+    for name in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        results[name] = benchmarks[name]()
+
+    report = {
+        'timestamp': time(),
+        'python': platform.python_version(),
+        'pyvmomi': getattr(pyVmomi, '__version__', None),
+        'params': vars(args),
+        'results': results,
+    }
+
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.output:
+        with open(args.output, 'a') as f:
+            f.write(json.dumps(report, sort_keys=True) + '\n')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -28,5 +28,6 @@ setup(name='vconnector',
         'pyvmomi >= 6.7.3',
         'docopt >= 0.6.2',
         'tabulate >= 0.8.3',
+        'futures >= 3.0.0; python_version < "3.0"',
       ]
 )
@@ -0,0 +1,305 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector asyncio module
+
+Requires Python 3.7 or later.
+
+"""
+
+import asyncio
+import logging
+import functools
+
+__all__ = ['AsyncVConnector']
+
+# Marker for the end of the retrieved pages
+_END = object()
+
+
+class AsyncVConnector(object):
+    """
+    AsyncVConnector class
+
+    Provides awaitable versions of the VConnector methods by running
+    the blocking calls in a thread pool executor, so that they do not
+    block the event loop.
+
+    The number of concurrent calls to the vSphere host is limited by
+    a semaphore. Cancelling an awaiting call stops waiting for its
+    result, but a call which has already been sent to the vSphere
+    host runs to completion in its thread.
+
+    """
+    def __init__(self, agent, concurrency=8, executor=None):
+        """
+        Initializes a new AsyncVConnector object
+
+        Args:
+            agent (VConnector): The VConnector instance to use
+            concurrency  (int): Maximum number of concurrent calls
+                                to the vSphere host
+            executor (concurrent.futures.Executor): Executor to run the
+                                blocking calls in, defaults to the
+                                default executor of the event loop
+
+        """
+        self.agent = agent
+        self.concurrency = concurrency
+        self.executor = executor
+        self._semaphore = None
+
+    @property
+    def host(self):
+        return self.agent.host
+
+    @property
+    def semaphore(self):
+        # Created lazily, so that it is bound to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._semaphore
+
+    async def _run(self, func, *args, **kwargs):
+        """
+        Run a blocking call in the executor
+
+        Args:
+            func (callable): The blocking callable to run
+
+        Returns:
+            The result of the call
+
+        """
+        loop = asyncio.get_running_loop()
+        async with self.semaphore:
+            return await loop.run_in_executor(
+                self.executor,
+                functools.partial(func, *args, **kwargs)
+            )
+
+    async def connect(self):
+        """
+        Connect to the VMware vSphere host
+
+        """
+        return await self._run(self.agent.connect)
+
+    async def disconnect(self):
+        """
+        Disconnect from the VMware vSphere host
+
+        """
+        return await self._run(self.agent.disconnect)
+
+    async def get_container_view(self, obj_type, container=None, recursive=True):
+        """
+        Get a vSphere Container View reference to all
+        objects of type 'obj_type'
+
+        See VConnector.get_container_view() for details.
+
+        """
+        return await self._run(
+            self.agent.get_container_view,
+            obj_type=obj_type,
+            container=container,
+            recursive=recursive
+        )
+
+    async def collect_properties(self,
+                                 view_ref,
+                                 obj_type,
+                                 path_set=None,
+                                 include_mors=False,
+                                 page_size=None):
+        """
+        Collect properties for managed objects from a view ref
+
+        See VConnector.collect_properties() for details.
+
+        """
+        return await self._run(
+            self.agent.collect_properties,
+            view_ref=view_ref,
+            obj_type=obj_type,
+            path_set=path_set,
+            include_mors=include_mors,
+            page_size=page_size
+        )
+
+    async def collect_properties_by_type(self,
+                                         path_sets,
+                                         container=None,
+                                         include_mors=False,
+                                         page_size=None):
+        """
+        Collect properties for managed objects of multiple types at once
+
+        See VConnector.collect_properties_by_type() for details.
+
+        """
+        return await self._run(
+            self.agent.collect_properties_by_type,
+            path_sets=path_sets,
+            container=container,
+            include_mors=include_mors,
+            page_size=page_size
+        )
+
+    async def collect_related(self,
+                              view_ref,
+                              obj_type,
+                              path_set,
+                              relations,
+                              include_mors=False,
+                              page_size=None):
+        """
+        Collect properties for managed objects and their related objects
+
+        See VConnector.collect_related() for details.
+
+        """
+        return await self._run(
+            self.agent.collect_related,
+            view_ref=view_ref,
+            obj_type=obj_type,
+            path_set=path_set,
+            relations=relations,
+            include_mors=include_mors,
+            page_size=page_size
+        )
+
+    async def collect_properties_for(self,
+                                     objs,
+                                     path_set=None,
+                                     obj_type=None,
+                                     include_mors=False,
+                                     batch_size=500,
+                                     max_workers=4,
+                                     use_views=False):
+        """
+        Collect properties for an explicit list of managed objects
+
+        See VConnector.collect_properties_for() for details.
+
+        """
+        return await self._run(
+            self.agent.collect_properties_for,
+            objs=objs,
+            path_set=path_set,
+            obj_type=obj_type,
+            include_mors=include_mors,
+            batch_size=batch_size,
+            max_workers=max_workers,
+            use_views=use_views
+        )
+
+    async def iter_properties(self,
+                              view_ref,
+                              obj_type,
+                              path_set=None,
+                              include_mors=False,
+                              page_size=None):
+        """
+        Collect properties for managed objects from a view ref page by page
+
+        Each page is retrieved in the executor, while the rows of
+        the page are yielded from the event loop. If the iteration
+        is stopped or cancelled before all pages have been retrieved
+        the server-side retrieval is cancelled.
+
+        See VConnector.iter_properties() for details.
+
+        Yields:
+            The properties for each managed object
+
+        """
+        filter_spec = self.agent._get_filter_spec(
+            view_ref=view_ref,
+            obj_type=obj_type,
+            path_set=path_set
+        )
+        pages = self.agent._retrieve_pages(filter_spec, page_size=page_size)
+        loop = asyncio.get_running_loop()
+        pending = None
+
+        try:
+            while True:
+                async with self.semaphore:
+                    # Shielded, so that a cancelled iteration can wait
+                    # for the page being retrieved before closing
+                    pending = loop.run_in_executor(self.executor, next, pages, _END)
+                    page = await asyncio.shield(pending)
+                pending = None
+
+                if page is _END:
+                    break
+
+                for obj in page:
+                    yield self.agent._object_content_to_dict(obj, include_mors)
+        finally:
+            try:
+                # A generator cannot be closed while it is running
+                if pending is not None:
+                    await asyncio.wait([pending])
+                    if not pending.cancelled():
+                        pending.exception()
+                # Cancels the server-side retrieval, if not completed
+                await loop.run_in_executor(self.executor, pages.close)
+            except Exception as e:
+                logging.warning(
+                    '[%s] Cannot close properties retrieval: %s',
+                    self.host,
+                    e
+                )
+
+    async def get_object_by_property(self, property_name, property_value, obj_type):
+        """
+        Find a Managed Object by a propery
+
+        See VConnector.get_object_by_property() for details.
+
+        """
+        return await self._run(
+            self.agent.get_object_by_property,
+            property_name=property_name,
+            property_value=property_value,
+            obj_type=obj_type
+        )
+
+    async def get_objects_by_property(self, property_name, property_values, obj_type):
+        """
+        Find multiple Managed Objects by a property
+
+        See VConnector.get_objects_by_property() for details.
+
+        """
+        return await self._run(
+            self.agent.get_objects_by_property,
+            property_name=property_name,
+            property_values=property_values,
+            obj_type=obj_type
+        )
@@ -27,15 +27,28 @@ The vConnector caching module
 
 """
 
+import heapq
 import logging
 import threading
+import itertools
 
 from time import time
-from collections import OrderedDict, namedtuple
+from collections import namedtuple
 
+from vconnector.metrics import Histogram
+from vconnector.metrics import format_prometheus
+from vconnector.eviction import EvictionPolicy
+from vconnector.eviction import get_eviction_policy
 from vconnector.exceptions import CacheException
 
-__all__ = ['CachedObject', 'CacheInventory']
+__all__ = [
+    'CachedObject',
+    'NegativeCachedObject',
+    'CacheStats',
+    'CacheInventory',
+    'ShardedCacheInventory',
+    'SingleFlight'
+]
 
 _CachedObjectInfo = namedtuple('CachedObjectInfo', ['name', 'hits', 'ttl', 'timestamp'])
 
@@ -56,13 +69,152 @@ class CachedObject(object):
         self.obj = obj
         self.ttl = ttl
         self.timestamp = time()
+        self.refreshing = False
+
+class NegativeCachedObject(CachedObject):
+    def __init__(self, name, ttl):
+        """
+        Initializes a new negative cache entry
+
+        A negative cache entry records that a lookup did not
+        find any object, so that repeated lookups for the same
+        missing object can be answered from the cache.
+
+        Args:
+            name               (str): Human readable name for the cached entry
+            ttl                (int): The TTL in seconds for the cached entry
+
+        """
+        super(NegativeCachedObject, self).__init__(name=name, obj=None, ttl=ttl)
+
+class CacheStats(object):
+    """
+    Aggregate statistics of a cache inventory
+
+    The counters are updated while holding the lock of the
+    cache inventory, so keeping them costs a few integer
+    increments per operation.
+
+    """
+    COUNTERS = ('hits', 'misses', 'negative_hits', 'expirations', 'evictions')
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all statistics
+
+        """
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.hit_latency = Histogram()
+        self.miss_latency = Histogram()
+
+    def merge(self, other):
+        """
+        Add the statistics of another cache inventory
+
+        Args:
+            other (CacheStats): The statistics to merge
+
+        """
+        for name in self.COUNTERS:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.hit_latency.merge(other.hit_latency)
+        self.miss_latency.merge(other.miss_latency)
+
+    def snapshot(self, size=0):
+        """
+        Get a snapshot of the statistics
+
+        The saved latency is an estimate of the time saved by the
+        cache, based on the mean latency of lookups which were
+        answered from the cache and the ones which were not.
+
+        Args:
+            size (int): Current number of items in the cache inventory
+
+        Returns:
+            A dict with the statistics
+
+        """
+        lookups = self.hits + self.negative_hits + self.misses
+        saved = 0.0
+        if self.miss_latency.count:
+            saved = (self.hits + self.negative_hits) * max(
+                0.0, self.miss_latency.mean - self.hit_latency.mean
+            )
+
+        data = dict((name, getattr(self, name)) for name in self.COUNTERS)
+        data.update({
+            'size': size,
+            'hit_ratio': float(self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            'latency_saved': saved,
+            'hit_latency': self.hit_latency.snapshot(),
+            'miss_latency': self.miss_latency.snapshot(),
+        })
+
+        return data
+
+    @staticmethod
+    def to_prometheus(snapshot, prefix='vconnector_cache', labels=None):
+        """
+        Format a snapshot of the statistics in the Prometheus text format
+
+        Args:
+            snapshot (dict): A snapshot of the statistics
+            prefix    (str): Prefix of the metric names
+            labels   (dict): Labels to add to each metric
+
+        Returns:
+            The formatted statistics
+
+        """
+        labels = labels or {}
+        lines = []
+
+        for name in CacheStats.COUNTERS:
+            lines.append(format_prometheus(
+                '{}_{}_total'.format(prefix, name),
+                'counter',
+                [(labels, snapshot[name])]
+            ))
+
+        lines.append(format_prometheus(
+            '{}_size'.format(prefix),
+            'gauge',
+            [(labels, snapshot['size'])]
+        ))
+        lines.append(format_prometheus(
+            '{}_latency_saved_seconds'.format(prefix),
+            'gauge',
+            [(labels, snapshot['latency_saved'])]
+        ))
+        lines.append(format_prometheus(
+            '{}_lookup_seconds'.format(prefix),
+            'histogram',
+            [
+                (dict(labels, result='hit'), snapshot['hit_latency']),
+                (dict(labels, result='miss'), snapshot['miss_latency']),
+            ]
+        ))
+
+        return ''.join(lines)
 
 class CacheInventory(object):
     """
     Inventory for cached objects
 
     """
-    def __init__(self, maxsize=0, housekeeping=0):
+    # Maximum number of expired items removed by the housekeeper
+    # before releasing the lock
+    HOUSEKEEPING_BATCH = 1000
+
+    def __init__(self, maxsize=0, housekeeping=0, policy='lru'):
         """
         Initializes a new cache inventory
 
@@ -71,6 +223,9 @@ class CacheInventory(object):
                                 that will be stored in the cache inventory
             housekeeping (int): Time in minutes to perform periodic
                                 cache housekeeping
+            policy       (str): Eviction policy to use once the upperbound
+                                limit has been reached, one of 'lru', 'lfu',
+                                'fifo' or 'size', or an EvictionPolicy instance
 
         Raises:
             CacheException
@@ -82,10 +237,15 @@ class CacheInventory(object):
         if housekeeping < 0:
             raise CacheException('Cache housekeeping period cannot be negative')
 
-        self._cache = OrderedDict()
+        self._cache = {}
+        # Min-heap of (expiration time, sequence, item) used by the housekeeper
+        self._expiry = []
+        self._expiry_seq = itertools.count()
+        self.policy = get_eviction_policy(policy)
         self.maxsize = maxsize
         self.housekeeping = housekeeping * 60.0
         self.lock = threading.RLock()
+        self.stats = CacheStats()
         self._schedule_housekeeper()
 
     def __len__(self):
@@ -117,10 +277,26 @@ class CacheInventory(object):
                     'Object %s has expired and will be removed from cache',
                     self.info(item.name)
                 )
-                self._cache.pop(item.name)
+                self._remove(item.name)
+                self.stats.expirations += 1
                 return True
             return False
 
+    def _remove(self, name):
+        """
+        Remove an item from the cache inventory
+
+        Args:
+            name (str): Name of the cached object
+
+        Returns:
+            The removed CachedObject instance
+
+        """
+        item = self._cache.pop(name)
+        self.policy.remove(item)
+        return item
+
     def _schedule_housekeeper(self):
         """
         Schedules the next run of the housekeeper
@@ -138,31 +314,68 @@ class CacheInventory(object):
         """
         Remove expired entries from the cache on regular basis
 
+        Only the expired entries are visited, in order of expiration.
+        The lock is released after each batch of removed entries, so
+        that other threads are not blocked for the whole run.
+
         """
-        with self.lock:
-            expired = 0
-            logging.info(
-                'Starting cache housekeeper [%d item(s) in cache]',
-                len(self._cache)
-            )
+        expired = 0
+        logging.info(
+            'Starting cache housekeeper [%d item(s) in cache]',
+            len(self)
+        )
+
+        done = False
+        while not done:
+            with self.lock:
+                now = time()
+                for _ in range(self.HOUSEKEEPING_BATCH):
+                    if not self._expiry or self._expiry[0][0] >= now:
+                        done = True
+                        break
+
+                    _, _, item = heapq.heappop(self._expiry)
+                    # Skip entries of items which were removed or replaced
+                    if self._cache.get(item.name) is item:
+                        self._remove(item.name)
+                        self.stats.expirations += 1
+                        expired += 1
+
+        logging.info(
+            'Cache housekeeper completed [%d item(s) removed from cache]',
+            expired
+        )
+        self._schedule_housekeeper()
 
-            items = list(self._cache.values())
-            for item in items:
-                if self._has_expired(item):
-                    expired += 1
+    def _push_expiry(self, item):
+        """
+        Add an item to the expiration index
 
-            logging.info(
-                'Cache housekeeper completed [%d item(s) removed from cache]',
-                expired
-            )
-            self._schedule_housekeeper()
+        Entries of removed or replaced items are dropped lazily, and the
+        index is rebuilt once these make up the majority of the index.
+
+        Args:
+            item (CachedObject): The cached object
+
+        """
+        heapq.heappush(
+            self._expiry,
+            (item.timestamp + item.ttl, next(self._expiry_seq), item)
+        )
+
+        if len(self._expiry) > 2 * len(self._cache) + 64:
+            self._expiry = [
+                (i.timestamp + i.ttl, next(self._expiry_seq), i)
+                for i in self._cache.values()
+            ]
+            heapq.heapify(self._expiry)
 
     def add(self, obj):
         """
         Add an item to the cache inventory
 
-        If the upperbound limit has been reached then the last item
-        is being removed from the inventory.
+        If the upperbound limit has been reached then an item selected
+        by the eviction policy is being removed from the inventory.
 
         Args:
             obj (CachedObject): A CachedObject instance to be added
@@ -175,40 +388,92 @@ class CacheInventory(object):
             raise CacheException('Need a CachedObject instance to add in the cache')
 
         with self.lock:
-            if 0 < self.maxsize == len(self._cache):
-                popped = self._cache.popitem(last=False)
+            if obj.name in self._cache:
+                self._remove(obj.name)
+
+            while 0 < self.maxsize <= len(self._cache):
+                name = self.policy.evict()
+                popped = self._cache.pop(name)
+                self.stats.evictions += 1
                 logging.debug(
                     'Cache maxsize reached, removing %s',
-                    self.info(name=popped.name)
+                    _CachedObjectInfo(popped.name, popped.hits, popped.ttl, popped.timestamp)
                 )
 
             self._cache[obj.name] = obj
+            self.policy.add(obj)
+            self._push_expiry(obj)
             logging.debug('Adding object to cache %s', self.info(name=obj.name))
 
-    def get(self, name):
+    def add_many(self, objs):
+        """
+        Add multiple items to the cache inventory
+
+        All items are added while holding the cache lock, so that
+        other threads see either none or all of the new items.
+
+        Args:
+            objs (list): A list of CachedObject instances to be added
+
+        Raises:
+            CacheException
+
+        """
+        with self.lock:
+            for obj in objs:
+                self.add(obj)
+
+    def get(self, name, default=None, record_stats=True):
         """
         Retrieve an object from the cache inventory
 
+        Negative cache entries return None, so a default other
+        than None can be used to tell apart a cached miss from
+        an object which is not in the cache.
+
+        The latency of lookups answered from the cache is recorded
+        here, while the latency of lookups which were not is recorded
+        by the caller using observe_lookup().
+
         Args:
-            name (str): Name of the cache item to retrieve
+            name          (str): Name of the cache item to retrieve
+            default      (type): Value to return if the item is not cached
+            record_stats (bool): If False do not update the statistics,
+                                 e.g. when re-checking the cache for a
+                                 lookup already counted as a miss
 
         Returns:
-            The cached object if found, None otherwise
+            The cached object if found, 'default' otherwise
 
         """
+        start = time()
         with self.lock:
             if name not in self._cache:
-                return None
+                if record_stats:
+                    self.stats.misses += 1
+                return default
 
             item = self._cache[name]
             if self._has_expired(item):
-                return None
+                if record_stats:
+                    self.stats.misses += 1
+                return default
+
+            if not record_stats:
+                return item.obj
+
+            if isinstance(item, NegativeCachedObject):
+                self.stats.negative_hits += 1
+            else:
+                self.stats.hits += 1
 
             item.hits += 1
+            self.policy.access(item)
             logging.debug(
                 'Returning object from cache %s',
                 self.info(name=item.name)
             )
+            self.stats.hit_latency.observe(time() - start)
 
             return item.obj
 
@@ -219,6 +484,8 @@ class CacheInventory(object):
         """
         with self.lock:
             self._cache.clear()
+            self.policy.clear()
+            self._expiry = []
 
     def info(self, name):
         """
@@ -234,3 +501,413 @@ class CacheInventory(object):
 
             item = self._cache[name]
             return _CachedObjectInfo(item.name, item.hits, item.ttl, item.timestamp)
+
+    def claim_refresh(self, name, soft_ttl):
+        """
+        Claim the refresh of a cached object past its soft TTL
+
+        Only the first caller claiming the refresh of a cached object
+        succeeds, until the object is replaced in the cache.
+
+        Args:
+            name       (str): Name of the cached object
+            soft_ttl (int): Time in seconds after which the cached
+                            object should be refreshed
+
+        Returns:
+            True if the refresh was claimed, False otherwise
+
+        """
+        with self.lock:
+            item = self._cache.get(name)
+            if item is None or item.refreshing:
+                return False
+
+            if time() <= item.timestamp + soft_ttl:
+                return False
+
+            item.refreshing = True
+            return True
+
+    def release_refresh(self, name):
+        """
+        Release a claimed refresh of a cached object
+
+        Used when the refresh has failed, so that the refresh
+        of the cached object can be claimed again.
+
+        Args:
+            name (str): Name of the cached object
+
+        """
+        with self.lock:
+            item = self._cache.get(name)
+            if item is not None:
+                item.refreshing = False
+
+    def observe_lookup(self, name, latency, hit=False):
+        """
+        Record the latency of a lookup using the cache inventory
+
+        Lookups answered from the cache are recorded by get(),
+        so this is needed only for lookups which were not.
+
+        Args:
+            name     (str): Name of the looked up object
+            latency (float): Time in seconds taken by the lookup
+            hit     (bool): True if the lookup was answered from the cache
+
+        """
+        with self.lock:
+            if hit:
+                self.stats.hit_latency.observe(latency)
+            else:
+                self.stats.miss_latency.observe(latency)
+
+    def get_stats(self):
+        """
+        Get a snapshot of the cache inventory statistics
+
+        Returns:
+            A dict with the statistics
+
+        """
+        with self.lock:
+            return self.stats.snapshot(size=len(self._cache))
+
+    def reset_stats(self):
+        """
+        Reset the cache inventory statistics
+
+        """
+        with self.lock:
+            self.stats.reset()
+
+class _ShardsLock(object):
+    """
+    Lock acquiring the locks of multiple cache shards
+
+    The locks are always acquired in the same order and released
+    in the reverse order, so that threads acquiring the locks of
+    overlapping shards cannot deadlock.
+
+    """
+    def __init__(self, locks):
+        """
+        Initializes a new lock of cache shards
+
+        Args:
+            locks (list): The shard locks in acquisition order
+
+        """
+        self.locks = locks
+
+    def acquire(self):
+        for lock in self.locks:
+            lock.acquire()
+        return True
+
+    def release(self):
+        for lock in reversed(self.locks):
+            lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class ShardedCacheInventory(object):
+    """
+    Inventory for cached objects split into independently locked shards
+
+    Cached objects are distributed among the shards by the hash of
+    their names, so that threads accessing different objects rarely
+    contend for the same lock. Provides the same interface as
+    CacheInventory, with 'lock' acquiring the locks of all shards.
+
+    """
+    def __init__(self, maxsize=0, housekeeping=0, policy='lru', shards=16):
+        """
+        Initializes a new sharded cache inventory
+
+        Args:
+            maxsize      (int): Upperbound limit on the number of items
+                                that will be stored in the cache inventory
+            housekeeping (int): Time in minutes to perform periodic
+                                cache housekeeping
+            policy       (str): Eviction policy to use within each shard,
+                                one of 'lru', 'lfu', 'fifo' or 'size'
+            shards       (int): Number of shards
+
+        Raises:
+            CacheException
+
+        """
+        if maxsize < 0:
+            raise CacheException('Cache inventory size cannot be negative')
+
+        if housekeeping < 0:
+            raise CacheException('Cache housekeeping period cannot be negative')
+
+        if shards < 1:
+            raise CacheException('Number of cache shards should be at least one')
+
+        if isinstance(policy, EvictionPolicy):
+            raise CacheException('Sharded cache inventory needs an eviction policy name')
+
+        # Each shard gets an equal share of the upperbound limit
+        shard_maxsize = -(-maxsize // shards)
+
+        self.maxsize = maxsize
+        self.housekeeping = housekeeping * 60.0
+        self.shards = [
+            CacheInventory(maxsize=shard_maxsize, policy=policy)
+            for _ in range(shards)
+        ]
+        self.lock = _ShardsLock([shard.lock for shard in self.shards])
+        self._schedule_housekeeper()
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+    def __contains__(self, key):
+        return key in self._shard(key)
+
+    def _shard(self, name):
+        """
+        Get the shard of a cached object
+
+        Args:
+            name (str): Name of the cached object
+
+        Returns:
+            The CacheInventory of the shard
+
+        """
+        return self.shards[hash(name) % len(self.shards)]
+
+    def _schedule_housekeeper(self):
+        """
+        Schedules the next run of the housekeeper
+
+        """
+        if self.housekeeping > 0:
+            t = threading.Timer(
+                interval=self.housekeeping,
+                function=self._housekeeper
+            )
+            t.daemon = True
+            t.start()
+
+    def _housekeeper(self):
+        """
+        Remove expired entries from all shards on regular basis
+
+        """
+        for shard in self.shards:
+            shard._housekeeper()
+
+        self._schedule_housekeeper()
+
+    def add(self, obj):
+        """
+        Add an item to the cache inventory
+
+        Args:
+            obj (CachedObject): A CachedObject instance to be added
+
+        Raises:
+            CacheException
+
+        """
+        if not isinstance(obj, CachedObject):
+            raise CacheException('Need a CachedObject instance to add in the cache')
+
+        self._shard(obj.name).add(obj)
+
+    def add_many(self, objs):
+        """
+        Add multiple items to the cache inventory
+
+        All items are added while holding the locks of the affected
+        shards, so that other threads see either none or all of the
+        new items. The locks are acquired in the order of the shards.
+
+        Args:
+            objs (list): A list of CachedObject instances to be added
+
+        Raises:
+            CacheException
+
+        """
+        by_shard = {}
+        for obj in objs:
+            if not isinstance(obj, CachedObject):
+                raise CacheException('Need a CachedObject instance to add in the cache')
+            by_shard.setdefault(hash(obj.name) % len(self.shards), []).append(obj)
+
+        indexes = sorted(by_shard)
+        with _ShardsLock([self.shards[i].lock for i in indexes]):
+            for i in indexes:
+                self.shards[i].add_many(by_shard[i])
+
+    def get(self, name, default=None, record_stats=True):
+        """
+        Retrieve an object from the cache inventory
+
+        Args:
+            name          (str): Name of the cache item to retrieve
+            default      (type): Value to return if the item is not cached
+            record_stats (bool): If False do not update the statistics
+
+        Returns:
+            The cached object if found, 'default' otherwise
+
+        """
+        return self._shard(name).get(name, default=default, record_stats=record_stats)
+
+    def clear(self):
+        """
+        Remove all items from the cache
+
+        """
+        for shard in self.shards:
+            shard.clear()
+
+    def info(self, name):
+        """
+        Get statistics about a cached object
+
+        Args:
+            name (str): Name of the cached object
+
+        """
+        return self._shard(name).info(name)
+
+    def claim_refresh(self, name, soft_ttl):
+        """
+        Claim the refresh of a cached object past its soft TTL
+
+        Args:
+            name       (str): Name of the cached object
+            soft_ttl (int): Time in seconds after which the cached
+                            object should be refreshed
+
+        Returns:
+            True if the refresh was claimed, False otherwise
+
+        """
+        return self._shard(name).claim_refresh(name, soft_ttl)
+
+    def release_refresh(self, name):
+        """
+        Release a claimed refresh of a cached object
+
+        Args:
+            name (str): Name of the cached object
+
+        """
+        self._shard(name).release_refresh(name)
+
+    def observe_lookup(self, name, latency, hit=False):
+        """
+        Record the latency of a lookup using the cache inventory
+
+        Lookups answered from the cache are recorded by get(),
+        so this is needed only for lookups which were not.
+
+        Args:
+            name     (str): Name of the looked up object
+            latency (float): Time in seconds taken by the lookup
+            hit     (bool): True if the lookup was answered from the cache
+
+        """
+        self._shard(name).observe_lookup(name, latency, hit)
+
+    def get_stats(self):
+        """
+        Get a snapshot of the statistics of all shards
+
+        Returns:
+            A dict with the statistics
+
+        """
+        stats = CacheStats()
+        size = 0
+        for shard in self.shards:
+            with shard.lock:
+                stats.merge(shard.stats)
+                size += len(shard._cache)
+
+        return stats.snapshot(size=size)
+
+    def reset_stats(self):
+        """
+        Reset the statistics of all shards
+
+        """
+        for shard in self.shards:
+            shard.reset_stats()
+
+
+class _SingleFlightCall(object):
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight(object):
+    """
+    Coalesces concurrent calls for the same key
+
+    Only the first caller for a key executes the call, while any
+    other callers for the same key wait for it to complete and
+    receive the same result or exception.
+
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._calls = {}
+
+    def __len__(self):
+        with self.lock:
+            return len(self._calls)
+
+    def do(self, key, func, *args, **kwargs):
+        """
+        Execute a call, unless a call for the same key is in flight
+
+        Args:
+            key  (str): Key identifying the call
+            func (callable): The callable to execute
+
+        Returns:
+            The result of the call
+
+        """
+        with self.lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _SingleFlightCall()
+                self._calls[key] = call
+
+        if not leader:
+            logging.debug('Waiting for in-flight call %s', key)
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args, **kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self._calls.pop(key, None)
+            call.event.set()
@@ -34,16 +34,80 @@ object properties.
 import ssl
 import logging
 import sqlite3
+import threading
+import functools
+
+from time import time
+from contextlib import closing
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 import pyVmomi
 import pyVim.connect
 
 from vconnector.cache import CachedObject
 from vconnector.cache import CacheInventory
+from vconnector.cache import ShardedCacheInventory
+from vconnector.cache import NegativeCachedObject
+from vconnector.cache import SingleFlight
+from vconnector.index import PropertyIndex
+from vconnector.views import ContainerViewPool
+from vconnector.perf import PerfCounterCatalog
+from vconnector.sharedcache import SharedCacheEntry
+from vconnector.sharedcache import SQLiteSharedCache
+from vconnector.instrument import Instrumentation
+from vconnector.instrument import instrumented
+from vconnector.table import PropertyTableBuilder
+from vconnector.table import record_class
+from vconnector.relations import check_relations
+from vconnector.relations import get_relation_specs
+from vconnector.relations import get_relation_path_sets
+from vconnector.relations import join_relations
 from vconnector.exceptions import VConnectorException
 
 __all__ = ['VConnector', 'VConnectorDatabase']
 
+# Marker for objects which are not present in the cache
+_NOT_CACHED = object()
+
+
+# Marks the threads running a call which reconnects on authentication errors
+_auth_retry = threading.local()
+
+
+def _reconnect_on_auth_error(method):
+    """
+    Decorator which reconnects and retries a VConnector method
+    once if the session is no longer authenticated
+
+    Only the outermost decorated call is retried, so that nested
+    calls do not reconnect multiple times. Only methods which create
+    the views they use should be decorated, as views belong to the
+    session which created them and cannot be used after reconnecting.
+
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if getattr(_auth_retry, 'active', False):
+            return method(self, *args, **kwargs)
+
+        _auth_retry.active = True
+        try:
+            si = self._si
+            try:
+                return method(self, *args, **kwargs)
+            except pyVmomi.vim.fault.NotAuthenticated:
+                logging.warning(
+                    '[%s] Session is no longer authenticated, trying to reconnect',
+                    self.host
+                )
+                self._reconnect_session(si)
+                return method(self, *args, **kwargs)
+        finally:
+            _auth_retry.active = False
+
+    return wrapper
+
 
 class VConnector(object):
     """
@@ -69,7 +133,21 @@ class VConnector(object):
                  cache_maxsize=0,
                  cache_enabled=False,
                  cache_ttl=300,
-                 cache_housekeeping=0
+                 cache_housekeeping=0,
+                 cache_negative_ttl=60,
+                 cache_policy='lru',
+                 cache_shards=1,
+                 cache_shared_path=None,
+                 cache_soft_ttl=0,
+                 cache_refresh_workers=2,
+                 index_enabled=False,
+                 index_ttl=300,
+                 view_idle_timeout=60,
+                 session_check_interval=60,
+                 keepalive_interval=0,
+                 session_db=None,
+                 perf_catalog_dir=None,
+                 instrumentation_enabled=False
     ):
         """
         Initializes a new VConnector object
@@ -88,6 +166,42 @@ class VConnector(object):
                                             cached object is considered as expired
             cache_housekeeping       (int): Time in minutes to perform periodic
                                             cache housekeeping
+            cache_negative_ttl       (int): Time in seconds after which a cached
+                                            lookup which did not find any
+                                            object is considered as expired
+            cache_policy             (str): Cache eviction policy, one of
+                                            'lru', 'lfu', 'fifo' or 'size'
+            cache_shards             (int): Number of independently locked
+                                            cache shards, useful when many
+                                            threads share the same VConnector
+            cache_shared_path        (str): Path to an SQLite database used as
+                                            a second-tier cache shared between
+                                            processes
+            cache_soft_ttl           (int): Time in seconds after which a cached
+                                            object is refreshed in the background,
+                                            while still being returned from cache
+            cache_refresh_workers    (int): Number of threads refreshing cached
+                                            objects in the background
+            index_enabled           (bool): If True use a reverse property index
+                                            for finding managed objects by property
+            index_ttl                (int): Time in seconds after which the
+                                            property index is considered as expired
+            view_idle_timeout        (int): Time in seconds after which pooled
+                                            container views which are not in use
+                                            are destroyed, with zero views are
+                                            destroyed as soon as not in use
+            session_check_interval   (int): Time in seconds after which the
+                                            session is checked for being alive
+                                            if no call has succeeded meanwhile
+            keepalive_interval       (int): Time in seconds to periodically
+                                            check the session in the background
+            session_db               (str): Path to a vConnector database
+                                            file used for storing the session,
+                                            so that it can be resumed later
+            perf_catalog_dir         (str): Path to a directory used for storing
+                                            the performance counter catalog
+            instrumentation_enabled (bool): If True record metrics for the
+                                            VConnector methods and SOAP operations
 
         """
         self.user = user
@@ -105,75 +219,292 @@ class VConnector(object):
             self.ssl_context = ssl_context
 
         self._si  = None
+        self._content = None
+        self._session_checked = 0
+        self._keepalive_timer = None
+        self._connect_lock = threading.RLock()
+        self.session_check_interval = session_check_interval
+        self.keepalive_interval = keepalive_interval
+        self.session_db = session_db
         self._perf_counter = None
         self._perf_interval = None
+        self._perf_catalog = None
+        self.perf_catalog_dir = perf_catalog_dir
+        self.instrumentation = Instrumentation(
+            host=self.host,
+            enabled=instrumentation_enabled
+        )
         self.cache_maxsize = cache_maxsize
         self.cache_enabled = cache_enabled
         self.cache_ttl = cache_ttl
         self.cache_housekeeping = cache_housekeeping
-        self.cache = CacheInventory(
-            maxsize=self.cache_maxsize,
-            housekeeping=self.cache_housekeeping
+        self.cache_negative_ttl = cache_negative_ttl
+        self.cache_policy = cache_policy
+        self.cache_shards = cache_shards
+        if self.cache_shards > 1:
+            self.cache = ShardedCacheInventory(
+                maxsize=self.cache_maxsize,
+                housekeeping=self.cache_housekeeping,
+                policy=self.cache_policy,
+                shards=self.cache_shards
+            )
+        else:
+            self.cache = CacheInventory(
+                maxsize=self.cache_maxsize,
+                housekeeping=self.cache_housekeeping,
+                policy=self.cache_policy
+            )
+        self.cache_soft_ttl = cache_soft_ttl
+        self.cache_refresh_workers = cache_refresh_workers
+        self._cache_refresher = None
+        self._cache_refresher_lock = threading.Lock()
+        self.cache_shared_path = cache_shared_path
+        self.cache_shared = None
+        if self.cache_shared_path:
+            self.cache_shared = SQLiteSharedCache(path=self.cache_shared_path)
+        self.index_enabled = index_enabled
+        self.index_ttl = index_ttl
+        self.index = PropertyIndex(agent=self, ttl=self.index_ttl)
+        self._lookups = SingleFlight()
+        self.view_idle_timeout = view_idle_timeout
+        self.views = ContainerViewPool(
+            agent=self,
+            idle_timeout=self.view_idle_timeout
         )
 
     @property
     def si(self):
         if not self._si:
-            self.connect()
-        if not self._si.content.sessionManager.currentSession:
-            logging.warning(
-                '[%s] Lost connection to vSphere host, trying to reconnect',
-                self.host
-            )
-            self.connect()
+            with self._connect_lock:
+                if not self._si:
+                    self.connect()
+        elif time() - self._session_checked >= self.session_check_interval:
+            self._check_session()
         return self._si
 
+    @property
+    def content(self):
+        si = self.si
+        if self._content is None:
+            self._content = si.RetrieveContent()
+        return self._content
+
     @property
     def perf_counter(self):
         if not self._perf_counter:
-            self._perf_counter = self.si.content.perfManager.perfCounter
+            self._perf_counter = self.content.perfManager.perfCounter
         return self._perf_counter
 
     @property
     def perf_interval(self):
         if not self._perf_interval:
-            self._perf_interval = self.si.content.perfManager.historicalInterval
+            self._perf_interval = self.content.perfManager.historicalInterval
         return self._perf_interval
 
+    @property
+    def perf_catalog(self):
+        if self._perf_catalog is None:
+            self._perf_catalog = PerfCounterCatalog.for_agent(
+                agent=self,
+                cache_dir=self.perf_catalog_dir
+            )
+        return self._perf_catalog
+
+    def _check_session(self):
+        """
+        Check if the session is still alive and reconnect if needed
+
+        """
+        si = self._si
+        content = self._content
+        if content is None:
+            content = si.RetrieveContent()
+
+        if not content.sessionManager.currentSession:
+            logging.warning(
+                '[%s] Lost connection to vSphere host, trying to reconnect',
+                self.host
+            )
+            self._reconnect_session(si)
+        else:
+            self._session_checked = time()
+
+    def _reconnect_session(self, si):
+        """
+        Reconnect to the VMware vSphere host after a session has failed
+
+        Reconnects are serialized, so that threads failing on the same
+        session reconnect only once. If the session has already been
+        replaced by another thread the new session is used instead.
+
+        Args:
+            si (vim.ServiceInstance): The service instance of the failed session
+
+        """
+        with self._connect_lock:
+            if self._si is si:
+                self.connect()
+
+    def _schedule_keepalive(self):
+        """
+        Schedules the next background check of the session
+
+        """
+        if self.keepalive_interval > 0:
+            t = threading.Timer(
+                interval=self.keepalive_interval,
+                function=self._keepalive
+            )
+            t.daemon = True
+            t.start()
+            self._keepalive_timer = t
+
+    def _keepalive(self):
+        """
+        Check the session in the background on regular basis
+
+        """
+        if not self._si:
+            return
+
+        try:
+            self._check_session()
+        except Exception as e:
+            logging.warning('[%s] Session keepalive failed: %s', self.host, e)
+        finally:
+            self._schedule_keepalive()
+
+    def _resume_session(self):
+        """
+        Resume the session stored in the session database
+
+        Only a session stored for the same host and user is resumed.
+        Stored sessions which are no longer authenticated are
+        removed from the session database.
+
+        Returns:
+            A vim.ServiceInstance if the session was resumed, None otherwise
+
+        """
+        with closing(VConnectorDatabase(self.session_db)) as db:
+            cookie = db.get_session(self.host, self.user)
+        if not cookie:
+            return None
+
+        logging.debug('[%s] Resuming stored session', self.host)
+
+        try:
+            stub = pyVim.connect.SmartStubAdapter(
+                host=self.host,
+                port=self.port,
+                sslContext=self.ssl_context
+            )
+            stub.cookie = cookie
+            si = pyVmomi.vim.ServiceInstance('ServiceInstance', stub)
+            alive = si.RetrieveContent().sessionManager.currentSession is not None
+        except pyVmomi.vim.fault.NotAuthenticated:
+            alive = False
+        except Exception as e:
+            # The stored session may still be valid, e.g. on network errors
+            logging.debug('[%s] Cannot resume stored session: %s', self.host, e)
+            return None
+
+        if not alive:
+            logging.info('[%s] Stored session is no longer valid, removing it', self.host)
+            with closing(VConnectorDatabase(self.session_db)) as db:
+                db.remove_session(self.host, self.user)
+            return None
+
+        return si
+
+    @instrumented
     def connect(self):
         """
         Connect to the VMware vSphere host
 
+        If a session database is used then the stored session
+        is resumed if still valid, otherwise a new session is
+        created and stored in the session database.
+
         Raises:
              VConnectorException
         
         """
         logging.info('Connecting vSphere Agent to %s', self.host)
-        
+
+        with self._connect_lock:
+            self._connect()
+
+        if self._keepalive_timer is None:
+            self._schedule_keepalive()
+
+    def _connect(self):
+        """
+        Create or resume the session, holding the connect lock
+
+        """
         try:
-            self._si = pyVim.connect.SmartConnect(
-                host=self.host,
-                user=self.user,
-                pwd=self.pwd,
-                port=self.port,
-                sslContext=self.ssl_context
-            )
+            si = None
+            if self.session_db:
+                si = self._resume_session()
+
+            if si is None:
+                si = pyVim.connect.SmartConnect(
+                    host=self.host,
+                    user=self.user,
+                    pwd=self.pwd,
+                    port=self.port,
+                    sslContext=self.ssl_context
+                )
+                if self.session_db:
+                    with closing(VConnectorDatabase(self.session_db)) as db:
+                        db.save_session(host=self.host, user=self.user, cookie=si._stub.cookie)
+
+            self.instrumentation.wrap_stub(si._stub)
+            self._si = si
+            self._content = None
+            self._session_checked = time()
+            # Views created by a previous session are gone
+            self.views.invalidate()
         except Exception as e:
             # TODO: Maybe retry connection after some time
             # before we finally give up on this vSphere host
             logging.error('Cannot connect to %s: %s', self.host, e)
             raise
 
-    def disconnect(self):
+    def disconnect(self, logout=True):
         """
         Disconnect from the VMware vSphere host
 
+        Args:
+            logout (bool): If False keep the session alive, so that it can
+                           be resumed later from the session database
+
         """
         if not self._si:
             return
 
         logging.info('Disconnecting vSphere Agent from %s', self.host)
-        pyVim.connect.Disconnect(self.si)
+
+        if self._keepalive_timer is not None:
+            self._keepalive_timer.cancel()
+            self._keepalive_timer = None
+
+        with self._cache_refresher_lock:
+            refresher, self._cache_refresher = self._cache_refresher, None
+        if refresher is not None:
+            refresher.shutdown(wait=False)
+
+        self.views.clear()
+
+        if logout:
+            if self.session_db:
+                with closing(VConnectorDatabase(self.session_db)) as db:
+                    db.remove_session(self.host, self.user)
+            pyVim.connect.Disconnect(self._si)
+
+        self._si = None
+        self._content = None
 
     def reconnect(self):
         """
@@ -246,11 +577,13 @@ class VConnector(object):
             obj_type=[pyVmomi.vim.DistributedVirtualSwitch]
         )
 
+    @instrumented
     def collect_properties(self,
                            view_ref,
                            obj_type,
                            path_set=[],
-                           include_mors=False):
+                           include_mors=False,
+                           page_size=None):
         """
         Collect properties for managed objects from a view ref
 
@@ -259,24 +592,482 @@ class VConnector(object):
     
             - http://pubs.vmware.com/vsphere-50/index.jsp#com.vmware.wssdk.pg.doc_50/PG_Ch5_PropertyCollector.7.2.html
 
+        The view ref belongs to the session which created it, so
+        this method does not reconnect if the session is no longer
+        authenticated. See iter_properties() for details.
+
         Args:
             view_ref (pyVmomi.vim.view.*): Starting point of inventory navigation
             obj_type      (pyVmomi.vim.*): Type of managed object
             path_set               (list): List of properties to retrieve
             include_mors           (bool): If True include the managed objects refs in the result
+            page_size               (int): Maximum number of objects to retrieve per page
 
         Returns:
             A list of properties for the managed objects
 
         """
-        collector = self.si.content.propertyCollector
+        return list(
+            self.iter_properties(
+                view_ref=view_ref,
+                obj_type=obj_type,
+                path_set=path_set,
+                include_mors=include_mors,
+                page_size=page_size
+            )
+        )
+
+    def iter_properties(self,
+                        view_ref,
+                        obj_type,
+                        path_set=None,
+                        include_mors=False,
+                        page_size=None):
+        """
+        Collect properties for managed objects from a view ref page by page
+
+        Unlike collect_properties() this method returns a generator,
+        which retrieves the results from the vSphere host in pages of
+        at most 'page_size' objects, so that only a single page is
+        kept in memory at any time.
+
+        If the caller stops iterating before all pages have been
+        retrieved the server-side retrieval is cancelled.
+
+        The view ref belongs to the session which created it, so
+        vim.fault.NotAuthenticated is raised to the caller, which
+        should create a new view. The agent reconnects on next use.
+
+        Args:
+            view_ref (pyVmomi.vim.view.*): Starting point of inventory navigation
+            obj_type      (pyVmomi.vim.*): Type of managed object
+            path_set               (list): List of properties to retrieve
+            include_mors           (bool): If True include the managed objects refs in the result
+            page_size               (int): Maximum number of objects to retrieve per page
+
+        Yields:
+            The properties for each managed object
+
+        """
+        logging.debug(
+            '[%s] Collecting properties for %s managed objects',
+            self.host,
+            obj_type.__name__
+        )
+
+        filter_spec = self._get_filter_spec(
+            view_ref=view_ref,
+            obj_type=obj_type,
+            path_set=path_set
+        )
+
+        for page in self._retrieve_pages(filter_spec, page_size=page_size):
+            for obj in page:
+                yield self._object_content_to_dict(obj, include_mors)
+
+    @instrumented
+    def collect_table(self,
+                      view_ref,
+                      obj_type,
+                      path_set,
+                      include_mors=False,
+                      page_size=None,
+                      as_numpy=False):
+        """
+        Collect properties for managed objects from a view ref as columns
+
+        Returns a PropertyTable with one column per property in
+        the path set, instead of a dict per managed object. Integer
+        and float properties are stored in array.array columns.
+        A table uses about a quarter of the memory of the
+        equivalent dicts, depending on the properties collected.
+        Columns with values of any other type, or with properties
+        missing for some objects, are stored as lists.
+
+        Args:
+            view_ref (pyVmomi.vim.view.*): Starting point of inventory navigation
+            obj_type      (pyVmomi.vim.*): Type of managed object
+            path_set               (list): List of properties to retrieve
+            include_mors           (bool): If True include the managed objects refs in the result
+            page_size               (int): Maximum number of objects to retrieve per page
+            as_numpy               (bool): If True store the numeric columns as NumPy arrays
+
+        Raises:
+            VConnectorException
+
+        Returns:
+            A PropertyTable instance
+
+        """
+        logging.debug(
+            '[%s] Collecting properties for %s managed objects as columns',
+            self.host,
+            obj_type.__name__
+        )
+
+        builder = PropertyTableBuilder(path_set=path_set, include_mors=include_mors)
+        filter_spec = self._get_filter_spec(
+            view_ref=view_ref,
+            obj_type=obj_type,
+            path_set=path_set
+        )
+
+        for page in self._retrieve_pages(filter_spec, page_size=page_size):
+            for obj in page:
+                builder.add(obj)
+
+        table = builder.build()
+
+        return table.to_numpy() if as_numpy else table
+
+    @instrumented
+    def collect_records(self,
+                        view_ref,
+                        obj_type,
+                        path_set,
+                        include_mors=False,
+                        page_size=None):
+        """
+        Collect properties for managed objects from a view ref as records
+
+        Returns an instance of a class with __slots__ per managed
+        object instead of a dict. See vconnector.table.record_class()
+        for the names of the record attributes. Properties missing
+        for a managed object are None.
+
+        Args:
+            view_ref (pyVmomi.vim.view.*): Starting point of inventory navigation
+            obj_type      (pyVmomi.vim.*): Type of managed object
+            path_set               (list): List of properties to retrieve
+            include_mors           (bool): If True include the managed objects refs in the result
+            page_size               (int): Maximum number of objects to retrieve per page
+
+        Raises:
+            VConnectorException
+
+        Returns:
+            A list of records for the managed objects
+
+        """
+        if not path_set:
+            raise VConnectorException('A path set is required for collecting records')
 
+        logging.debug(
+            '[%s] Collecting properties for %s managed objects as records',
+            self.host,
+            obj_type.__name__
+        )
+
+        cls = record_class(path_set=path_set, include_mors=include_mors)
+        filter_spec = self._get_filter_spec(
+            view_ref=view_ref,
+            obj_type=obj_type,
+            path_set=path_set
+        )
+
+        records = []
+        for page in self._retrieve_pages(filter_spec, page_size=page_size):
+            for obj in page:
+                properties = dict((prop.name, prop.val) for prop in obj.propSet)
+                values = [properties.get(path) for path in path_set]
+                if include_mors:
+                    values.append(obj.obj)
+                records.append(cls(*values))
+
+        return records
+
+    @instrumented
+    @_reconnect_on_auth_error
+    def collect_properties_by_type(self,
+                                   path_sets,
+                                   container=None,
+                                   include_mors=False,
+                                   page_size=None):
+        """
+        Collect properties for managed objects of multiple types at once
+
+        A single container view over all types and a single
+        property filter spec with a property spec per type are used,
+        so that the properties for all types are retrieved from the
+        vSphere host in one paged collection.
+
+        Example:
+            client.collect_properties_by_type(
+                path_sets={
+                    pyVmomi.vim.HostSystem: ['name', 'runtime.connectionState'],
+                    pyVmomi.vim.VirtualMachine: ['name', 'runtime.powerState'],
+                }
+            )
+
+        Args:
+            path_sets                   (dict): Mapping of managed object type to
+                                                list of properties to retrieve
+            container (vim.ManagedEntity): Starting point of inventory search
+            include_mors                (bool): If True include the managed objects refs in the result
+            page_size                    (int): Maximum number of objects to retrieve per page
+
+        Returns:
+            A dict of managed object type -> list of properties for the managed objects
+
+        """
         logging.debug(
             '[%s] Collecting properties for %s managed objects',
             self.host,
+            ', '.join(sorted(t.__name__ for t in path_sets))
+        )
+
+        result = dict((obj_type, []) for obj_type in path_sets)
+        # Objects are returned under the most specific of the requested
+        # types, e.g. vim.ManagedEntity and vim.HostSystem
+        type_of = {}
+
+        def get_type(cls):
+            if cls not in type_of:
+                matches = [t for t in path_sets if issubclass(cls, t)]
+                matches.sort(key=lambda t: len(t.__mro__), reverse=True)
+                type_of[cls] = matches[0] if matches else None
+            return type_of[cls]
+
+        with self.container_view(obj_type=list(path_sets), container=container) as view_ref:
+            filter_spec = self._get_filter_spec(
+                view_ref=view_ref,
+                obj_type=path_sets
+            )
+
+            for page in self._retrieve_pages(filter_spec, page_size=page_size):
+                for obj in page:
+                    obj_type = get_type(obj.obj.__class__)
+                    if obj_type is not None:
+                        result[obj_type].append(
+                            self._object_content_to_dict(obj, include_mors)
+                        )
+
+        return result
+
+    @instrumented
+    def collect_related(self,
+                        view_ref,
+                        obj_type,
+                        path_set,
+                        relations,
+                        include_mors=False,
+                        page_size=None):
+        """
+        Collect properties for managed objects and their related objects
+
+        The relations are followed on the vSphere host by traversal
+        specs, so that the properties of the managed objects and of
+        the objects they reference are retrieved by a single property
+        collector call, instead of a round trip for each reference.
+
+        The properties of the related objects are joined to the rows
+        of the managed objects under the name of each relation, which
+        replaces the managed object ref(s) of the related objects.
+
+        Example:
+            client.collect_related(
+                view_ref=client.get_vm_view(),
+                obj_type=pyVmomi.vim.VirtualMachine,
+                path_set=['name'],
+                relations=[
+                    Relation(
+                        path='runtime.host',
+                        obj_type=pyVmomi.vim.HostSystem,
+                        path_set=['name']
+                    )
+                ]
+            )
+
+        Args:
+            view_ref (pyVmomi.vim.view.*): Starting point of inventory navigation
+            obj_type      (pyVmomi.vim.*): Type of managed object
+            path_set               (list): List of properties to retrieve
+            relations              (list): List of vconnector.relations.Relation instances
+            include_mors           (bool): If True include the managed objects refs in the result
+            page_size               (int): Maximum number of objects to retrieve per page
+
+        Raises:
+            VConnectorException
+
+        Returns:
+            A list of joined properties for the managed objects
+
+        """
+        check_relations(obj_type=obj_type, relations=relations)
+
+        logging.debug(
+            '[%s] Collecting properties for %s managed objects and related objects',
+            self.host,
             obj_type.__name__
         )
 
+        filter_spec = self._get_filter_spec(
+            view_ref=view_ref,
+            obj_type=get_relation_path_sets(
+                obj_type=obj_type,
+                path_set=path_set,
+                relations=relations
+            )
+        )
+        # Follow the relations of the objects in the view
+        traversal_spec = filter_spec.objectSet[0].selectSet[0]
+        traversal_spec.selectSet = get_relation_specs(
+            obj_type=obj_type,
+            relations=relations
+        )
+
+        # Related objects may be returned on any page
+        contents = OrderedDict()
+        for page in self._retrieve_pages(filter_spec, page_size=page_size):
+            for obj in page:
+                contents[obj.obj._moId] = obj
+
+        return join_relations(
+            contents=contents,
+            obj_type=obj_type,
+            relations=relations,
+            include_mors=include_mors
+        )
+
+    @instrumented
+    @_reconnect_on_auth_error
+    def collect_properties_for(self,
+                               objs,
+                               path_set=None,
+                               obj_type=None,
+                               include_mors=False,
+                               batch_size=500,
+                               max_workers=4,
+                               use_views=False):
+        """
+        Collect properties for an explicit list of managed objects
+
+        The managed objects are split into batches of at most
+        'batch_size' objects, which are collected concurrently, so
+        that the cost of the collection depends on the number of
+        requested objects and not on the size of the inventory.
+
+        By default the objects of each batch are passed directly to
+        the property collector, which fails the whole batch if any
+        of the objects no longer exists. The objects of such a batch
+        are then collected one at a time, skipping the objects which
+        no longer exist. If 'use_views' is True a list view is created
+        for each batch instead, which ignores such objects. The list
+        views are always destroyed.
+
+        Args:
+            objs              (list): List of managed objects
+            path_set          (list): List of properties to retrieve
+            obj_type (pyVmomi.vim.*): Type of managed object, defaults to
+                                      the types of the given objects
+            include_mors      (bool): If True include the managed objects refs in the result
+            batch_size         (int): Maximum number of objects per batch
+            max_workers        (int): Maximum number of batches collected concurrently
+            use_views         (bool): If True use a list view for each batch
+
+        Returns:
+            A list of properties for the managed objects
+
+        """
+        objs = list(objs)
+        if not objs:
+            return []
+
+        if obj_type is not None:
+            path_sets = {obj_type: path_set}
+        else:
+            path_sets = dict((o.__class__, path_set) for o in objs)
+
+        batches = [objs[i:i + batch_size] for i in range(0, len(objs), batch_size)]
+
+        logging.debug(
+            '[%s] Collecting properties for %d managed objects in %d batches',
+            self.host,
+            len(objs),
+            len(batches)
+        )
+
+        def collect_each(batch):
+            result = []
+            for obj in batch:
+                try:
+                    result.extend(self._collect_batch([obj], path_sets, include_mors))
+                except pyVmomi.vmodl.fault.ManagedObjectNotFound:
+                    logging.debug('[%s] Skipping missing managed object %s', self.host, obj)
+            return result
+
+        def collect(batch):
+            if not use_views:
+                try:
+                    return self._collect_batch(batch, path_sets, include_mors)
+                except pyVmomi.vmodl.fault.ManagedObjectNotFound:
+                    if len(batch) == 1:
+                        return []
+                    return collect_each(batch)
+
+            view_ref = self.get_list_view(batch)
+            try:
+                return self._collect_batch(view_ref, path_sets, include_mors)
+            finally:
+                try:
+                    view_ref.DestroyView()
+                except Exception as e:
+                    logging.warning('[%s] Cannot destroy list view: %s', self.host, e)
+
+        if len(batches) == 1 or max_workers <= 1:
+            results = [collect(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+                results = list(executor.map(collect, batches))
+
+        return [properties for result in results for properties in result]
+
+    def _collect_batch(self, objs, path_sets, include_mors=False):
+        """
+        Collect properties for a batch of managed objects
+
+        Args:
+            objs (list or vim.view.ListView): List of managed objects or a list view ref
+            path_sets                 (dict): Mapping of managed object type to path set
+            include_mors              (bool): If True include the managed objects refs in the result
+
+        Returns:
+            A list of properties for the managed objects
+
+        """
+        if isinstance(objs, pyVmomi.vim.view.ListView):
+            filter_spec = self._get_filter_spec(view_ref=objs, obj_type=path_sets)
+        else:
+            filter_spec = pyVmomi.vmodl.query.PropertyCollector.FilterSpec()
+            filter_spec.objectSet = [
+                pyVmomi.vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False)
+                for obj in objs
+            ]
+            filter_spec.propSet = [
+                self._get_property_spec(t, p) for t, p in path_sets.items()
+            ]
+
+        return [
+            self._object_content_to_dict(obj, include_mors)
+            for page in self._retrieve_pages(filter_spec)
+            for obj in page
+        ]
+
+    def _get_filter_spec(self, view_ref, obj_type, path_set=None):
+        """
+        Create a property filter spec for collecting properties
+        of managed objects from a view ref
+
+        Args:
+            view_ref (pyVmomi.vim.view.*): Starting point of inventory navigation
+            obj_type (pyVmomi.vim.* or dict): Type of managed object, or a mapping
+                                              of managed object type to path set
+            path_set               (list): List of properties to retrieve
+
+        Returns:
+            A vmodl.query.PropertyCollector.FilterSpec instance
+
+        """
         # Create object specification to define the starting point of
         # inventory navigation
         obj_spec = pyVmomi.vmodl.query.PropertyCollector.ObjectSpec()
@@ -292,59 +1083,149 @@ class VConnector(object):
         traversal_spec.type = view_ref.__class__
         obj_spec.selectSet = [traversal_spec]
 
-        # Identify the properties to the retrieved
+        if isinstance(obj_type, dict):
+            path_sets = obj_type
+        else:
+            path_sets = {obj_type: path_set}
+
+        # Add the object and property specification to the
+        # property filter specification
+        filter_spec = pyVmomi.vmodl.query.PropertyCollector.FilterSpec()
+        filter_spec.objectSet = [obj_spec]
+        filter_spec.propSet = [
+            self._get_property_spec(t, p) for t, p in path_sets.items()
+        ]
+
+        return filter_spec
+
+    def _get_property_spec(self, obj_type, path_set=None):
+        """
+        Create a property spec identifying the properties to be retrieved
+
+        Args:
+            obj_type (pyVmomi.vim.*): Type of managed object
+            path_set          (list): List of properties to retrieve
+
+        Returns:
+            A vmodl.query.PropertyCollector.PropertySpec instance
+
+        """
         property_spec = pyVmomi.vmodl.query.PropertyCollector.PropertySpec()
         property_spec.type = obj_type
-                
+
         if not path_set:
             logging.warning(
                 '[%s] Retrieving all properties for objects, this might take a while...',
                 self.host
             )
             property_spec.all = True
-            
-        property_spec.pathSet = path_set
 
-        # Add the object and property specification to the
-        # property filter specification
-        filter_spec = pyVmomi.vmodl.query.PropertyCollector.FilterSpec()
-        filter_spec.objectSet = [obj_spec]
-        filter_spec.propSet = [property_spec]
+        property_spec.pathSet = path_set or []
+
+        return property_spec
+
+    def _retrieve_pages(self, filter_spec, page_size=None):
+        """
+        Retrieve the objects matching a property filter spec page by page
+
+        Uses RetrievePropertiesEx() for retrieving the first page and
+        ContinueRetrievePropertiesEx() for the remaining pages. If the
+        generator is closed before the last page has been retrieved
+        the token is cancelled using CancelRetrievePropertiesEx().
+
+        Args:
+            filter_spec (vmodl.query.PropertyCollector.FilterSpec): The filter spec
+            page_size                                        (int): Maximum number of objects per page
+
+        Yields:
+            A list of vmodl.query.PropertyCollector.ObjectContent instances
+
+        """
+        collector = self.content.propertyCollector
+        options = pyVmomi.vmodl.query.PropertyCollector.RetrieveOptions()
+        if page_size:
+            options.maxObjects = page_size
+
+        token = None
+        try:
+            try:
+                result = collector.RetrievePropertiesEx(
+                    specSet=[filter_spec],
+                    options=options
+                )
+            except pyVmomi.vim.fault.NotAuthenticated:
+                # Make sure the session is checked on next use
+                self._session_checked = 0
+                raise
+            self._session_checked = time()
+
+            while result is not None:
+                token = result.token
+                yield result.objects
+
+                if not token:
+                    break
+
+                next_token, token = token, None
+                result = collector.ContinueRetrievePropertiesEx(token=next_token)
+        finally:
+            if token:
+                logging.debug(
+                    '[%s] Cancelling retrieval of remaining properties',
+                    self.host
+                )
+                try:
+                    collector.CancelRetrievePropertiesEx(token=token)
+                except Exception as e:
+                    logging.warning(
+                        '[%s] Cannot cancel properties retrieval: %s',
+                        self.host,
+                        e
+                    )
+
+    def _object_content_to_dict(self, obj, include_mors=False):
+        """
+        Convert the properties of a managed object to a dict
 
-        # Retrieve properties
-        props = collector.RetrieveContents([filter_spec])
+        Args:
+            obj (vmodl.query.PropertyCollector.ObjectContent): The object content
+            include_mors                               (bool): If True include the managed object ref
 
-        data = []
-        for obj in props:
-            properties = {}
-            for prop in obj.propSet:
-                properties[prop.name] = prop.val
+        Returns:
+            A dict with the properties of the managed object
 
-            if include_mors:
-                properties['obj'] = obj.obj
+        """
+        properties = {}
+        for prop in obj.propSet:
+            properties[prop.name] = prop.val
 
-            data.append(properties)
+        if include_mors:
+            properties['obj'] = obj.obj
 
-        return data
+        return properties
 
-    def get_container_view(self, obj_type, container=None):
+    @instrumented
+    @_reconnect_on_auth_error
+    def get_container_view(self, obj_type, container=None, recursive=True):
         """
         Get a vSphere Container View reference to all
         objects of type 'obj_type'
 
         It is up to the caller to take care of destroying the View
-        when no longer needed.
+        when no longer needed. See container_view() for getting
+        a pooled view, which is destroyed automatically.
 
         Args:
             obj_type               (list): A list of managed object types
             container (vim.ManagedEntity): Starting point of inventory search
+            recursive              (bool): If True search recursively
 
         Returns:
             A container view ref to the discovered managed objects
 
         """
         if not container:
-            container = self.si.content.rootFolder
+            container = self.content.rootFolder
 
         logging.debug(
             '[%s] Getting container view ref to %s managed objects',
@@ -352,14 +1233,42 @@ class VConnector(object):
             [t.__name__ for t in obj_type]
         )
 
-        view_ref = self.si.content.viewManager.CreateContainerView(
+        view_ref = self.content.viewManager.CreateContainerView(
             container=container,
             type=obj_type,
-            recursive=True
+            recursive=recursive
         )
 
         return view_ref
 
+    def container_view(self, obj_type, container=None, recursive=True):
+        """
+        Get a pooled vSphere Container View reference to all
+        objects of type 'obj_type'
+
+        The view is shared with other users of the same view and
+        is returned to the pool when the context exits, e.g.:
+
+            with agent.container_view(obj_type=[pyVmomi.vim.HostSystem]) as view_ref:
+                ...
+
+        Args:
+            obj_type               (list): A list of managed object types
+            container (vim.ManagedEntity): Starting point of inventory search
+            recursive              (bool): If True search recursively
+
+        Returns:
+            A context manager yielding the container view ref
+
+        """
+        return self.views.view(
+            obj_type=obj_type,
+            container=container,
+            recursive=recursive
+        )
+
+    @instrumented
+    @_reconnect_on_auth_error
     def get_list_view(self, obj):
         """
         Get a vSphere List View reference 
@@ -374,16 +1283,19 @@ class VConnector(object):
             A list view ref to the managed objects
         
         """
-        view_ref = self.si.content.viewManager.CreateListView(obj=obj)
+        view_ref = self.content.viewManager.CreateListView(obj=obj)
 
+        # Logging the object names would fetch them one by one
         logging.debug(
-            '[%s] Getting list view ref for %s objects',
+            '[%s] Getting list view ref for %d objects',
             self.host,
-            [o.name for o in obj]
+            len(obj)
         )
 
         return view_ref
 
+    @instrumented
+    @_reconnect_on_auth_error
     def get_object_by_property(self, property_name, property_value, obj_type):
         """
         Find a Managed Object by a propery
@@ -391,6 +1303,18 @@ class VConnector(object):
         If cache is enabled then we search for the managed object from the
         cache first and if present we return the object from cache.
 
+        Lookups which do not find any object are cached as well, using
+        the negative cache TTL. Concurrent lookups for the same object
+        which is not in the cache wait for a single collection.
+
+        If a soft TTL is set then cached objects older than the soft
+        TTL are still returned from cache, while being refreshed in
+        the background.
+
+        If the property index is enabled then the managed object is
+        looked up in the index, which is built by collecting the
+        property for all objects of the given type only once.
+
         Args:
             property_name            (str): Name of the property to look for
             property_value           (str): Value of the property to match 
@@ -403,37 +1327,390 @@ class VConnector(object):
         if not issubclass(obj_type, pyVmomi.vim.ManagedEntity):
             raise VConnectorException('Type should be a subclass of vim.ManagedEntity')
 
-        if self.cache_enabled:
-            cached_obj_name = '{}:{}'.format(obj_type.__name__, property_value)
-            if cached_obj_name in self.cache:
-                logging.debug('Using cached object %s', cached_obj_name)
-                return self.cache.get(cached_obj_name)
+        if not self.cache_enabled:
+            return self._find_object_by_property(
+                property_name=property_name,
+                property_value=property_value,
+                obj_type=obj_type
+            )
 
-        view_ref = self.get_container_view(obj_type=[obj_type])
-        props = self.collect_properties(
-            view_ref=view_ref,
-            obj_type=obj_type,
-            path_set=[property_name],
-            include_mors=True
+        start = time()
+        cached_obj_name = '{}:{}'.format(obj_type.__name__, property_value)
+        obj = self.cache.get(cached_obj_name, default=_NOT_CACHED)
+        if obj is not _NOT_CACHED:
+            logging.debug('Using cached object %s', cached_obj_name)
+
+            if self.cache_soft_ttl and self.cache.claim_refresh(cached_obj_name, self.cache_soft_ttl):
+                self._schedule_cache_refresh(
+                    cached_obj_name,
+                    property_name,
+                    property_value,
+                    obj_type
+                )
+
+            return obj
+
+        # Concurrent lookups for the same object wait for a single collection
+        obj = self._lookups.do(
+            '{}:{}'.format(property_name, cached_obj_name),
+            self._lookup_and_cache,
+            cached_obj_name,
+            property_name,
+            property_value,
+            obj_type
         )
-        view_ref.DestroyView()
+        self.cache.observe_lookup(cached_obj_name, time() - start, hit=False)
+
+        return obj
+
+    def _lookup_and_cache(self, cached_obj_name, property_name, property_value, obj_type):
+        """
+        Find a Managed Object by a property and add the result to the cache
+
+        Args:
+            cached_obj_name          (str): Name of the cache entry
+            property_name            (str): Name of the property to look for
+            property_value           (str): Value of the property to match
+            obj_type       (pyVmomi.vim.*): Type of the Managed Object
+
+        Returns:
+            The first matching object
+
+        """
+        # The object may have been cached while waiting to get here,
+        # the lookup has already been counted as a miss by the caller
+        obj = self.cache.get(cached_obj_name, default=_NOT_CACHED, record_stats=False)
+        if obj is not _NOT_CACHED:
+            return obj
+
+        obj = self._get_shared_cached_object(cached_obj_name)
+        if obj is not _NOT_CACHED:
+            return obj
+
+        obj = self._find_object_by_property(
+            property_name=property_name,
+            property_value=property_value,
+            obj_type=obj_type
+        )
+        self._add_cached_objects([(cached_obj_name, obj)])
+
+        return obj
+
+    def _schedule_cache_refresh(self, cached_obj_name, property_name, property_value, obj_type):
+        """
+        Schedules a background refresh of a cached object
+
+        Args:
+            cached_obj_name          (str): Name of the cache entry
+            property_name            (str): Name of the property to look for
+            property_value           (str): Value of the property to match
+            obj_type       (pyVmomi.vim.*): Type of the Managed Object
+
+        """
+        logging.debug('Scheduling refresh of cached object %s', cached_obj_name)
+
+        try:
+            with self._cache_refresher_lock:
+                if self._cache_refresher is None:
+                    self._cache_refresher = ThreadPoolExecutor(max_workers=self.cache_refresh_workers)
+
+                self._cache_refresher.submit(
+                    self._refresh_cached_object,
+                    cached_obj_name,
+                    property_name,
+                    property_value,
+                    obj_type
+                )
+        except Exception as e:
+            logging.warning(
+                '[%s] Cannot schedule refresh of cached object %s: %s',
+                self.host,
+                cached_obj_name,
+                e
+            )
+            self.cache.release_refresh(cached_obj_name)
+
+    def _refresh_cached_object(self, cached_obj_name, property_name, property_value, obj_type):
+        """
+        Refresh a cached object, logging any errors
+
+        If the refresh fails the claim on the cached object is
+        released, so that a later lookup can refresh it again.
+
+        Args:
+            cached_obj_name          (str): Name of the cache entry
+            property_name            (str): Name of the property to look for
+            property_value           (str): Value of the property to match
+            obj_type       (pyVmomi.vim.*): Type of the Managed Object
+
+        """
+        def refresh():
+            obj = self._find_object_by_property(
+                property_name=property_name,
+                property_value=property_value,
+                obj_type=obj_type
+            )
+            self._add_cached_objects([(cached_obj_name, obj)])
+            return obj
+
+        refreshed = False
+        try:
+            # Share the collection with concurrent lookups of the same object
+            self._lookups.do(
+                '{}:{}'.format(property_name, cached_obj_name),
+                refresh
+            )
+            refreshed = True
+        except Exception as e:
+            logging.warning(
+                '[%s] Cannot refresh cached object %s: %s',
+                self.host,
+                cached_obj_name,
+                e
+            )
+        finally:
+            if not refreshed:
+                self.cache.release_refresh(cached_obj_name)
+
+    def _find_object_by_property(self, property_name, property_value, obj_type):
+        """
+        Find a Managed Object by a property, bypassing the cache
+
+        Args:
+            property_name            (str): Name of the property to look for
+            property_value           (str): Value of the property to match
+            obj_type       (pyVmomi.vim.*): Type of the Managed Object
+
+        Returns:
+            The first matching object
+
+        """
+        if self.index_enabled:
+            return self.index.lookup(
+                obj_type=obj_type,
+                property_name=property_name,
+                property_value=property_value
+            )
+
+        with self.container_view(obj_type=[obj_type]) as view_ref:
+            props = self.collect_properties(
+                view_ref=view_ref,
+                obj_type=obj_type,
+                path_set=[property_name],
+                include_mors=True
+            )
 
         obj = None
         for each_obj in props:
-            if each_obj[property_name] == property_value:
+            if each_obj.get(property_name) == property_value:
                 obj = each_obj['obj']
                 break
 
-        if self.cache_enabled:
-            cached_obj = CachedObject(
-                name=cached_obj_name,
-                obj=obj,
-                ttl=self.cache_ttl
+        return obj
+
+    def _get_cached_object(self, name, obj, ttl=None):
+        """
+        Create a cache entry for the result of a lookup
+
+        Lookups which did not find any object are cached as
+        negative cache entries using the negative cache TTL.
+
+        Args:
+            name  (str): Name of the cache entry
+            obj  (type): The managed object or None
+            ttl   (int): The TTL of the cache entry, defaults to
+                         the cache TTL or negative cache TTL
+
+        Returns:
+            A CachedObject instance
+
+        """
+        if obj is None:
+            if ttl is None:
+                ttl = self.cache_negative_ttl
+            return NegativeCachedObject(name=name, ttl=ttl)
+
+        if ttl is None:
+            ttl = self.cache_ttl
+        return CachedObject(name=name, obj=obj, ttl=ttl)
+
+    def _add_cached_objects(self, results):
+        """
+        Add the results of lookups to the cache and the shared cache
+
+        Args:
+            results (list): A list of (cache entry name, managed object or None) tuples
+
+        """
+        cached_objs = [self._get_cached_object(name, obj) for name, obj in results]
+        self.cache.add_many(cached_objs)
+
+        if self.cache_shared is None:
+            return
+
+        entries = []
+        for cached_obj in cached_objs:
+            obj_type, moid = None, None
+            if cached_obj.obj is not None:
+                obj_type = pyVmomi.VmomiSupport.GetVmodlName(type(cached_obj.obj))
+                moid = cached_obj.obj._moId
+            entries.append(
+                SharedCacheEntry(
+                    name=cached_obj.name,
+                    obj_type=obj_type,
+                    moid=moid,
+                    expires=cached_obj.timestamp + cached_obj.ttl
+                )
             )
-            self.cache.add(obj=cached_obj)
+
+        try:
+            self.cache_shared.add_many(self.host, entries)
+        except Exception as e:
+            logging.warning('[%s] Cannot update shared cache: %s', self.host, e)
+
+    def _get_shared_cached_object(self, name):
+        """
+        Get a managed object from the shared cache
+
+        The managed object is re-created from its type and id using the
+        current session and is added to the cache with the remaining TTL
+        of the shared cache entry.
+
+        Args:
+            name (str): Name of the cache entry
+
+        Returns:
+            The cached object if found, _NOT_CACHED otherwise
+
+        """
+        if self.cache_shared is None:
+            return _NOT_CACHED
+
+        try:
+            entry = self.cache_shared.get(self.host, name)
+        except Exception as e:
+            logging.warning('[%s] Cannot read shared cache: %s', self.host, e)
+            return _NOT_CACHED
+
+        if entry is None:
+            return _NOT_CACHED
+
+        obj = None
+        if entry.obj_type is not None:
+            obj_type = pyVmomi.VmomiSupport.GetVmodlType(entry.obj_type)
+            obj = obj_type(entry.moid, stub=self.si._stub)
+
+        logging.debug('Using shared cached object %s', name)
+        self.cache.add(obj=self._get_cached_object(name, obj, ttl=entry.expires - time()))
 
         return obj
 
+    @instrumented
+    @_reconnect_on_auth_error
+    def get_objects_by_property(self, property_name, property_values, obj_type):
+        """
+        Find multiple Managed Objects by a property
+
+        All values which are not found in the cache are resolved using a
+        single collection of the properties for the given type.
+
+        Args:
+            property_name     (str or list): Name(s) of the properties to look for
+            property_values            (list): Values of the properties to match
+            obj_type          (pyVmomi.vim.*): Type of the Managed Objects
+
+        Returns:
+            A dict of property value -> first matching object, where
+            the object is None if no object matches the value
+
+        """
+        if not issubclass(obj_type, pyVmomi.vim.ManagedEntity):
+            raise VConnectorException('Type should be a subclass of vim.ManagedEntity')
+
+        if isinstance(property_name, (list, tuple)):
+            property_names = list(property_name)
+        else:
+            property_names = [property_name]
+
+        start = time()
+        result = {}
+        pending = set(property_values)
+
+        missed = []
+        if self.cache_enabled:
+            for value in list(pending):
+                cached_obj_name = '{}:{}'.format(obj_type.__name__, value)
+                obj = self.cache.get(cached_obj_name, default=_NOT_CACHED)
+                if obj is _NOT_CACHED:
+                    missed.append(value)
+                    obj = self._get_shared_cached_object(cached_obj_name)
+                if obj is not _NOT_CACHED:
+                    result[value] = obj
+                    pending.discard(value)
+
+            logging.debug(
+                '[%s] Using %d cached %s object(s)',
+                self.host,
+                len(result),
+                obj_type.__name__
+            )
+
+        if not pending:
+            self._observe_missed_lookups(obj_type, missed, start)
+            return result
+
+        found = {}
+        if self.index_enabled:
+            for name in property_names:
+                index = self.index.get_index(obj_type=obj_type, property_name=name)
+                for value in pending:
+                    if value not in found and value in index:
+                        found[value] = index[value]
+        else:
+            with self.container_view(obj_type=[obj_type]) as view_ref:
+                props = self.iter_properties(
+                    view_ref=view_ref,
+                    obj_type=obj_type,
+                    path_set=property_names,
+                    include_mors=True
+                )
+                for each_obj in props:
+                    for name in property_names:
+                        value = each_obj.get(name)
+                        try:
+                            if value in pending and value not in found:
+                                found[value] = each_obj['obj']
+                        except TypeError:
+                            # Unhashable values cannot match any of the lookup values
+                            continue
+
+        for value in pending:
+            result[value] = found.get(value)
+
+        if self.cache_enabled:
+            self._add_cached_objects([
+                ('{}:{}'.format(obj_type.__name__, value), result[value])
+                for value in pending
+            ])
+
+            self._observe_missed_lookups(obj_type, missed, start)
+
+        return result
+
+    def _observe_missed_lookups(self, obj_type, values, start):
+        """
+        Record the latency of lookups which were not answered from the cache
+
+        Args:
+            obj_type (pyVmomi.vim.*): Type of the Managed Objects
+            values            (list): The looked up property values
+            start            (float): Time when the lookups started
+
+        """
+        latency = time() - start
+        for value in values:
+            self.cache.observe_lookup('{}:{}'.format(obj_type.__name__, value), latency)
+
 class VConnectorDatabase(object):
     """
     VConnectorDatabase class
@@ -458,6 +1735,14 @@ class VConnectorDatabase(object):
         """
         self.db = db
         self.conn = sqlite3.connect(self.db)
+        self._init_sessions()
+
+    def close(self):
+        """
+        Close the connection to the vConnector database
+
+        """
+        self.conn.close()
 
     def init_db(self):
         """
@@ -551,6 +1836,92 @@ class VConnectorDatabase(object):
 
         return result
 
+    def _init_sessions(self):
+        """
+        Creates the sessions table if it does not exist yet
+
+        """
+        sql = """
+        CREATE TABLE IF NOT EXISTS sessions (
+            host TEXT,
+            user TEXT,
+            cookie TEXT,
+            timestamp REAL,
+            PRIMARY KEY (host, user)
+        )
+        """
+
+        self.cursor = self.conn.cursor()
+        self.cursor.execute(sql)
+        self.conn.commit()
+        self.cursor.close()
+
+    def get_session(self, host, user):
+        """
+        Get the stored session of a vSphere Agent
+
+        Sessions are stored per host and user, so that a session
+        is resumed only with the credentials which created it.
+
+        Args:
+            host (str): Hostname of the vSphere Agent
+            user (str): Username of the session
+
+        Returns:
+            The session cookie if found, None otherwise
+
+        """
+        logging.debug('Getting stored session for vSphere Agent %s', host)
+
+        self.cursor = self.conn.cursor()
+        self.cursor.execute(
+            'SELECT cookie FROM sessions WHERE host = ? AND user = ?',
+            (host, user)
+        )
+        row = self.cursor.fetchone()
+        self.cursor.close()
+
+        return row[0] if row else None
+
+    def save_session(self, host, user, cookie):
+        """
+        Store the session of a vSphere Agent
+
+        Args:
+            host   (str): Hostname of the vSphere Agent
+            user   (str): Username of the session
+            cookie (str): The session cookie
+
+        """
+        logging.debug('Storing session for vSphere Agent %s', host)
+
+        self.cursor = self.conn.cursor()
+        self.cursor.execute(
+            'INSERT OR REPLACE INTO sessions VALUES (?,?,?,?)',
+            (host, user, cookie, time())
+        )
+        self.conn.commit()
+        self.cursor.close()
+
+    def remove_session(self, host, user):
+        """
+        Remove the stored session of a vSphere Agent
+
+        Args:
+            host (str): Hostname of the vSphere Agent
+            user (str): Username of the session
+
+        """
+        logging.debug('Removing stored session for vSphere Agent %s', host)
+
+        self.cursor = self.conn.cursor()
+        self.cursor.execute(
+            'DELETE FROM sessions WHERE host = ? AND user = ?',
+            (host, user)
+        )
+        self.conn.commit()
+        self.cursor.close()
+
     def enable_agent(self, host):
         """
         Mark a vSphere Agent as enabled
@@ -0,0 +1,322 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector cache eviction policies module
+
+"""
+
+import sys
+
+from collections import OrderedDict
+
+from vconnector.exceptions import CacheException
+
+__all__ = [
+    'EvictionPolicy',
+    'FIFOPolicy',
+    'LRUPolicy',
+    'LFUPolicy',
+    'SizePolicy',
+    'get_eviction_policy'
+]
+
+
+def _move_to_end(d, key):
+    """
+    Move a key to the end of an OrderedDict
+
+    """
+    if hasattr(d, 'move_to_end'):
+        d.move_to_end(key)
+    else:
+        d[key] = d.pop(key)
+
+
+class EvictionPolicy(object):
+    """
+    Base class for cache eviction policies
+
+    An eviction policy keeps track of the cached items and selects
+    the item to be removed once the cache inventory is full. All
+    methods are called while holding the cache inventory lock.
+
+    """
+    def add(self, item):
+        """
+        Track a new item
+
+        Args:
+            item (CachedObject): The item added to the cache
+
+        """
+        raise NotImplementedError
+
+    def access(self, item):
+        """
+        Track an access of an item
+
+        Args:
+            item (CachedObject): The item returned from the cache
+
+        """
+        raise NotImplementedError
+
+    def remove(self, item):
+        """
+        Stop tracking an item
+
+        Args:
+            item (CachedObject): The item removed from the cache
+
+        """
+        raise NotImplementedError
+
+    def evict(self):
+        """
+        Select the item to be removed from the cache
+
+        Returns:
+            The name of the item to be removed
+
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        """
+        Stop tracking all items
+
+        """
+        raise NotImplementedError
+
+class FIFOPolicy(EvictionPolicy):
+    """
+    Evicts the oldest item first
+
+    """
+    def __init__(self):
+        self._order = OrderedDict()
+
+    def add(self, item):
+        self._order[item.name] = None
+
+    def access(self, item):
+        pass
+
+    def remove(self, item):
+        self._order.pop(item.name, None)
+
+    def evict(self):
+        name, _ = self._order.popitem(last=False)
+        return name
+
+    def clear(self):
+        self._order.clear()
+
+class LRUPolicy(FIFOPolicy):
+    """
+    Evicts the least recently used item first
+
+    """
+    def access(self, item):
+        _move_to_end(self._order, item.name)
+
+class _FrequencyNode(object):
+    def __init__(self, hits, prev=None, next=None):
+        self.hits = hits
+        self.names = OrderedDict()
+        self.prev = prev
+        self.next = next
+
+class LFUPolicy(EvictionPolicy):
+    """
+    Evicts the least frequently used item first
+
+    Uses the hits counter of the cached items and keeps the items
+    in a list of frequency nodes, so that all operations are O(1).
+    Items with the same number of hits are evicted in LRU order.
+
+    """
+    def __init__(self):
+        self._head = None
+        self._nodes = {}
+
+    def _unlink(self, node):
+        if node.prev is not None:
+            node.prev.next = node.next
+        else:
+            self._head = node.next
+
+        if node.next is not None:
+            node.next.prev = node.prev
+
+    def _insert_after(self, prev, hits):
+        if prev is None:
+            node = _FrequencyNode(hits, next=self._head)
+            if self._head is not None:
+                self._head.prev = node
+            self._head = node
+        else:
+            node = _FrequencyNode(hits, prev=prev, next=prev.next)
+            if prev.next is not None:
+                prev.next.prev = node
+            prev.next = node
+
+        return node
+
+    def _detach(self, name):
+        node = self._nodes.pop(name)
+        del node.names[name]
+        prev = node.prev
+        if not node.names:
+            self._unlink(node)
+            return prev
+        return node
+
+    def add(self, item):
+        node = self._head
+        if node is None or node.hits != item.hits:
+            node = self._insert_after(None, item.hits)
+
+        node.names[item.name] = None
+        self._nodes[item.name] = node
+
+    def access(self, item):
+        node = self._nodes[item.name]
+        if node.next is not None and node.next.hits == item.hits:
+            target = node.next
+        else:
+            target = None
+
+        prev = self._detach(item.name)
+        if target is None:
+            target = self._insert_after(prev, item.hits)
+
+        target.names[item.name] = None
+        self._nodes[item.name] = target
+
+    def remove(self, item):
+        if item.name in self._nodes:
+            self._detach(item.name)
+
+    def evict(self):
+        name = next(iter(self._head.names))
+        self._detach(name)
+        return name
+
+    def clear(self):
+        self._head = None
+        self._nodes.clear()
+
+class SizePolicy(EvictionPolicy):
+    """
+    Evicts large items first
+
+    Items are grouped in size classes of powers of two and the least
+    recently used item of the largest size class is evicted first.
+    The number of size classes is bounded, so all operations are O(1).
+
+    Negative cache entries, i.e. items without an object, are in a
+    size class of their own, which is evicted before all others.
+
+    """
+    # Size class of the negative cache entries, larger than any other
+    NEGATIVE_CLASS = float('inf')
+
+    def __init__(self, sizeof=sys.getsizeof):
+        """
+        Initializes a new SizePolicy object
+
+        Args:
+            sizeof (callable): Callable returning the size of a cached object
+
+        """
+        self.sizeof = sizeof
+        self._classes = {}
+        self._class_of = {}
+
+    def add(self, item):
+        if item.obj is None:
+            size_class = self.NEGATIVE_CLASS
+        else:
+            size_class = int(self.sizeof(item.obj)).bit_length()
+        self._classes.setdefault(size_class, OrderedDict())[item.name] = None
+        self._class_of[item.name] = size_class
+
+    def access(self, item):
+        _move_to_end(self._classes[self._class_of[item.name]], item.name)
+
+    def remove(self, item):
+        size_class = self._class_of.pop(item.name, None)
+        if size_class is None:
+            return
+
+        names = self._classes[size_class]
+        del names[item.name]
+        if not names:
+            del self._classes[size_class]
+
+    def evict(self):
+        size_class = max(self._classes)
+        names = self._classes[size_class]
+        name, _ = names.popitem(last=False)
+        if not names:
+            del self._classes[size_class]
+        del self._class_of[name]
+        return name
+
+    def clear(self):
+        self._classes.clear()
+        self._class_of.clear()
+
+_POLICIES = {
+    'fifo': FIFOPolicy,
+    'lru': LRUPolicy,
+    'lfu': LFUPolicy,
+    'size': SizePolicy,
+}
+
+def get_eviction_policy(policy):
+    """
+    Get an eviction policy by name
+
+    Args:
+        policy (str or EvictionPolicy): Name of the policy, one of
+                                        'fifo', 'lru', 'lfu' or 'size',
+                                        or an EvictionPolicy instance
+
+    Returns:
+        An EvictionPolicy instance
+
+    Raises:
+        CacheException
+
+    """
+    if isinstance(policy, EvictionPolicy):
+        return policy
+
+    if policy not in _POLICIES:
+        raise CacheException('Unknown cache eviction policy {}'.format(policy))
+
+    return _POLICIES[policy]()
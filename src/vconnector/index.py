@@ -0,0 +1,221 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector property index module
+
+"""
+
+import logging
+import threading
+
+from time import time
+
+from vconnector.cache import CachedObject
+from vconnector.cache import CacheInventory
+from vconnector.cache import SingleFlight
+
+__all__ = ['PropertyIndex']
+
+
+class PropertyIndex(object):
+    """
+    Reverse index of managed object properties
+
+    The PropertyIndex maps the values of a property to the
+    managed objects having that value, so that looking up a
+    managed object by a property requires a single collection
+    of the property for all objects of a given type, instead of
+    one collection per lookup.
+
+    Index entries are stored in a CacheInventory and are
+    rebuilt in the background once they are older than
+    'refresh' seconds. Lookups block only when an index entry
+    does not exist yet or has expired, in which case concurrent
+    lookups wait for a single build of the index entry.
+
+    """
+    def __init__(self, agent, ttl=300, refresh=None, page_size=1000):
+        """
+        Initializes a new PropertyIndex object
+
+        Args:
+            agent   (VConnector): A VConnector instance
+            ttl            (int): Time in seconds after which an index
+                                  entry is considered as expired
+            refresh        (int): Time in seconds after which an index
+                                  entry is rebuilt in the background.
+                                  Defaults to 80% of the TTL
+            page_size      (int): Maximum number of objects to retrieve
+                                  per page when building an index entry
+
+        """
+        self.agent = agent
+        self.ttl = ttl
+        self.refresh = refresh if refresh is not None else ttl * 0.8
+        self.page_size = page_size
+        self.cache = CacheInventory()
+        self._builds = SingleFlight()
+        self._refreshing = set()
+        self._refreshing_lock = threading.Lock()
+
+    def _index_name(self, obj_type, property_name):
+        return '{}:{}'.format(obj_type.__name__, property_name)
+
+    def build(self, obj_type, property_name):
+        """
+        Build the index for a property of a managed object type
+
+        Args:
+            obj_type (pyVmomi.vim.*): Type of the Managed Object
+            property_name      (str): Name of the property to index
+
+        Returns:
+            A dict of property value -> managed object
+
+        """
+        logging.debug(
+            '[%s] Building index of %s managed objects by %s',
+            self.agent.host,
+            obj_type.__name__,
+            property_name
+        )
+
+        with self.agent.container_view(obj_type=[obj_type]) as view_ref:
+            props = self.agent.iter_properties(
+                view_ref=view_ref,
+                obj_type=obj_type,
+                path_set=[property_name],
+                include_mors=True,
+                page_size=self.page_size
+            )
+
+            index = {}
+            for each_obj in props:
+                value = each_obj.get(property_name)
+                try:
+                    index.setdefault(value, each_obj['obj'])
+                except TypeError:
+                    # Unhashable property values cannot be indexed
+                    continue
+
+        cached_obj = CachedObject(
+            name=self._index_name(obj_type, property_name),
+            obj=index,
+            ttl=self.ttl
+        )
+        self.cache.add(obj=cached_obj)
+
+        return index
+
+    def _refresh(self, obj_type, property_name):
+        """
+        Rebuild an index entry, logging any errors
+
+        """
+        name = self._index_name(obj_type, property_name)
+        try:
+            self._builds.do(name, self.build, obj_type, property_name)
+        except Exception as e:
+            logging.warning(
+                '[%s] Cannot refresh index %s: %s',
+                self.agent.host,
+                name,
+                e
+            )
+        finally:
+            with self._refreshing_lock:
+                self._refreshing.discard(name)
+
+    def _schedule_refresh(self, obj_type, property_name):
+        """
+        Schedule a background rebuild of an index entry
+
+        """
+        name = self._index_name(obj_type, property_name)
+        with self._refreshing_lock:
+            if name in self._refreshing:
+                return
+            self._refreshing.add(name)
+
+        logging.debug('[%s] Scheduling refresh of index %s', self.agent.host, name)
+        t = threading.Thread(
+            target=self._refresh,
+            args=(obj_type, property_name)
+        )
+        t.daemon = True
+        t.start()
+
+    def get_index(self, obj_type, property_name):
+        """
+        Get the index for a property of a managed object type
+
+        The index is built if it does not exist yet or has expired.
+
+        Args:
+            obj_type (pyVmomi.vim.*): Type of the Managed Object
+            property_name      (str): Name of the indexed property
+
+        Returns:
+            A dict of property value -> managed object
+
+        """
+        name = self._index_name(obj_type, property_name)
+        with self.cache.lock:
+            index = self.cache.get(name)
+            info = self.cache.info(name)
+
+        if index is None:
+            return self._builds.do(name, self.build, obj_type, property_name)
+
+        if time() > info.timestamp + self.refresh:
+            self._schedule_refresh(obj_type, property_name)
+
+        return index
+
+    def lookup(self, obj_type, property_name, property_value):
+        """
+        Find a Managed Object by a property using the index
+
+        Args:
+            obj_type       (pyVmomi.vim.*): Type of the Managed Object
+            property_name            (str): Name of the property to look for
+            property_value           (str): Value of the property to match
+
+        Returns:
+            The first matching object if found, None otherwise
+
+        """
+        index = self.get_index(obj_type, property_name)
+        try:
+            return index.get(property_value)
+        except TypeError:
+            return None
+
+    def clear(self):
+        """
+        Remove all entries from the index
+
+        """
+        self.cache.clear()
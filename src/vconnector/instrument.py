@@ -0,0 +1,448 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector instrumentation module
+
+"""
+
+import logging
+import threading
+import functools
+
+from time import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from vconnector.metrics import Histogram
+from vconnector.metrics import format_prometheus
+
+__all__ = ['CallEvent', 'Instrumentation', 'Profile', 'instrumented']
+
+CallEvent = namedtuple(
+    'CallEvent',
+    ['host', 'kind', 'name', 'latency', 'objects', 'size', 'error']
+)
+
+
+def _count_objects(result):
+    """
+    Count the number of objects returned by a call
+
+    """
+    if result is None:
+        return 0
+
+    if isinstance(result, (list, tuple, dict)):
+        return len(result)
+
+    # vmodl.query.PropertyCollector.RetrieveResult
+    objects = getattr(result, 'objects', None)
+    if objects is not None:
+        return len(objects)
+
+    return 1
+
+
+def _count_values(result):
+    """
+    Count the number of property values returned by a call
+
+    The pyVmomi stub does not expose the size of the SOAP
+    responses, so the number of returned property values is
+    used as an approximation of the response size.
+
+    """
+    if result is None:
+        return 0
+
+    objects = getattr(result, 'objects', None)
+    if objects is not None:
+        result = objects
+
+    if isinstance(result, dict):
+        return len(result)
+
+    if isinstance(result, (list, tuple)):
+        size = 0
+        for item in result:
+            if isinstance(item, dict):
+                size += len(item)
+            else:
+                prop_set = getattr(item, 'propSet', None)
+                size += len(prop_set) if prop_set is not None else 1
+        return size
+
+    return 1
+
+
+class _CallMetrics(object):
+    """
+    Metrics of a single instrumented method or SOAP operation
+
+    """
+    __slots__ = ('count', 'errors', 'objects', 'size', 'latency')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.objects = 0
+        self.size = 0
+        self.latency = Histogram()
+
+    def observe(self, event):
+        self.count += 1
+        self.objects += event.objects
+        self.size += event.size
+        self.latency.observe(event.latency)
+        if event.error is not None:
+            self.errors += 1
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'objects': self.objects,
+            'size': self.size,
+            'latency': self.latency.snapshot(),
+        }
+
+
+class Profile(object):
+    """
+    Calls recorded while profiling a block of code
+
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.start = time()
+        self.end = None
+
+    def _record(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    @property
+    def elapsed(self):
+        return (self.end or time()) - self.start
+
+    def summary(self):
+        """
+        Summarize the recorded calls
+
+        Returns:
+            A dict of '<kind>:<name>' -> dict with the number of calls,
+            errors, returned objects, size and total latency
+
+        """
+        result = {}
+        with self.lock:
+            events = list(self.events)
+
+        for event in events:
+            key = '{}:{}'.format(event.kind, event.name)
+            summary = result.setdefault(key, {
+                'count': 0,
+                'errors': 0,
+                'objects': 0,
+                'size': 0,
+                'latency': 0.0,
+            })
+            summary['count'] += 1
+            summary['objects'] += event.objects
+            summary['size'] += event.size
+            summary['latency'] += event.latency
+            if event.error is not None:
+                summary['errors'] += 1
+
+        return result
+
+
+class Instrumentation(object):
+    """
+    Instrumentation of VConnector methods and SOAP operations
+
+    Records the number of calls, latency, number of returned
+    objects and property values of each instrumented VConnector
+    method and each SOAP operation invoked on the vSphere host.
+
+    Pre hooks are called as pre(host, kind, name) before each
+    call and post hooks as post(event) with a CallEvent after it,
+    where kind is either 'method' or 'soap'.
+
+    When disabled and without any hooks or profiles the
+    instrumented calls are invoked directly, so that the
+    overhead is a single attribute lookup per call.
+
+    """
+    def __init__(self, host, enabled=False):
+        """
+        Initializes a new Instrumentation object
+
+        Args:
+            host     (str): Host name used as label of the metrics
+            enabled (bool): If True record metrics for all calls
+
+        """
+        self.host = host
+        self.lock = threading.Lock()
+        self._enabled = enabled
+        self._pre_hooks = []
+        self._post_hooks = []
+        self._profiles = []
+        self._metrics = {}
+        self.active = enabled
+
+    def _update_active(self):
+        self.active = bool(
+            self._enabled or self._pre_hooks or self._post_hooks or self._profiles
+        )
+
+    @property
+    def enabled(self):
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value):
+        with self.lock:
+            self._enabled = value
+            self._update_active()
+
+    def add_hook(self, pre=None, post=None):
+        """
+        Register hooks called around each instrumented call
+
+        Args:
+            pre  (callable): Called as pre(host, kind, name)
+            post (callable): Called as post(event) with a CallEvent
+
+        """
+        with self.lock:
+            if pre is not None:
+                self._pre_hooks = self._pre_hooks + [pre]
+            if post is not None:
+                self._post_hooks = self._post_hooks + [post]
+            self._update_active()
+
+    def remove_hook(self, pre=None, post=None):
+        """
+        Unregister hooks previously registered by add_hook()
+
+        Args:
+            pre  (callable): The pre hook to remove
+            post (callable): The post hook to remove
+
+        """
+        with self.lock:
+            if pre is not None:
+                self._pre_hooks = [h for h in self._pre_hooks if h is not pre]
+            if post is not None:
+                self._post_hooks = [h for h in self._post_hooks if h is not post]
+            self._update_active()
+
+    def call(self, kind, name, func, *args, **kwargs):
+        """
+        Invoke and instrument a call
+
+        Args:
+            kind      (str): Kind of the call, 'method' or 'soap'
+            name      (str): Name of the method or SOAP operation
+            func (callable): The function to invoke
+
+        Returns:
+            The result of the function
+
+        """
+        for hook in self._pre_hooks:
+            try:
+                hook(self.host, kind, name)
+            except Exception as e:
+                logging.warning('[%s] Instrumentation pre hook failed: %s', self.host, e)
+
+        result = None
+        error = None
+        start = time()
+        try:
+            result = func(*args, **kwargs)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.record(
+                CallEvent(
+                    host=self.host,
+                    kind=kind,
+                    name=name,
+                    latency=time() - start,
+                    objects=_count_objects(result),
+                    size=_count_values(result),
+                    error=error
+                )
+            )
+
+    def record(self, event):
+        """
+        Record a call event and pass it to the post hooks
+
+        Args:
+            event (CallEvent): The call event
+
+        """
+        if self._enabled:
+            key = (event.kind, event.name)
+            with self.lock:
+                metrics = self._metrics.get(key)
+                if metrics is None:
+                    metrics = self._metrics[key] = _CallMetrics()
+                metrics.observe(event)
+
+        for profile in self._profiles:
+            profile._record(event)
+
+        for hook in self._post_hooks:
+            try:
+                hook(event)
+            except Exception as e:
+                logging.warning('[%s] Instrumentation post hook failed: %s', self.host, e)
+
+    @contextmanager
+    def profile(self):
+        """
+        Context manager recording all calls made within a block
+
+        Calls made by other threads using the same VConnector
+        while the block runs are recorded as well.
+
+        Yields:
+            A Profile object
+
+        """
+        profile = Profile()
+        with self.lock:
+            self._profiles = self._profiles + [profile]
+            self._update_active()
+
+        try:
+            yield profile
+        finally:
+            profile.end = time()
+            with self.lock:
+                self._profiles = [p for p in self._profiles if p is not profile]
+                self._update_active()
+
+    def wrap_stub(self, stub):
+        """
+        Instrument the SOAP operations invoked through a pyVmomi stub
+
+        Property accessors of managed objects are invoked as
+        'Fetch' operations by the stub and are recorded as such.
+
+        Args:
+            stub (pyVmomi.SoapStubAdapter): The stub to instrument
+
+        """
+        if getattr(stub, '_vconnector_instrumented', False):
+            return
+
+        invoke_method = stub.InvokeMethod
+
+        def InvokeMethod(mo, info, args, *rest, **kwargs):
+            if not self.active:
+                return invoke_method(mo, info, args, *rest, **kwargs)
+            return self.call('soap', info.wsdlName, invoke_method, mo, info, args, *rest, **kwargs)
+
+        stub.InvokeMethod = InvokeMethod
+        stub._vconnector_instrumented = True
+
+    def reset(self):
+        """
+        Reset all recorded metrics
+
+        """
+        with self.lock:
+            self._metrics = {}
+
+    def snapshot(self):
+        """
+        Get a snapshot of the recorded metrics
+
+        Returns:
+            A dict of '<kind>:<name>' -> metrics of the call
+
+        """
+        with self.lock:
+            return dict(
+                ('{}:{}'.format(kind, name), metrics.snapshot())
+                for (kind, name), metrics in self._metrics.items()
+            )
+
+    def to_prometheus(self, prefix='vconnector'):
+        """
+        Format the recorded metrics in the Prometheus text exposition format
+
+        Args:
+            prefix (str): Prefix of the metric names
+
+        Returns:
+            The formatted metrics
+
+        """
+        with self.lock:
+            items = sorted(
+                ((kind, name), metrics.snapshot())
+                for (kind, name), metrics in self._metrics.items()
+            )
+
+        def samples(field):
+            return [
+                ({'host': self.host, 'kind': kind, 'name': name}, snapshot[field])
+                for (kind, name), snapshot in items
+            ]
+
+        return ''.join([
+            format_prometheus(prefix + '_calls_total', 'counter', samples('count')),
+            format_prometheus(prefix + '_call_errors_total', 'counter', samples('errors')),
+            format_prometheus(prefix + '_call_objects_total', 'counter', samples('objects')),
+            format_prometheus(prefix + '_call_values_total', 'counter', samples('size')),
+            format_prometheus(prefix + '_call_latency_seconds', 'histogram', samples('latency')),
+        ])
+
+
+def instrumented(method):
+    """
+    Decorator which instruments a VConnector method
+
+    """
+    name = method.__name__
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        instrumentation = self.instrumentation
+        if not instrumentation.active:
+            return method(self, *args, **kwargs)
+        return instrumentation.call('method', name, method, self, *args, **kwargs)
+
+    return wrapper
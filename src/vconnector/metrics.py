@@ -0,0 +1,158 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector metrics module
+
+"""
+
+from bisect import bisect_left
+
+__all__ = ['Histogram', 'format_prometheus']
+
+# Default latency buckets in seconds
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+
+class Histogram(object):
+    """
+    Histogram of observed values with fixed buckets
+
+    Not thread-safe, callers are expected to hold a lock
+    when observing values from multiple threads.
+
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initializes a new Histogram object
+
+        Args:
+            buckets (tuple): Sorted upper bounds of the buckets
+
+        """
+        self.buckets = tuple(buckets)
+        self.reset()
+
+    def reset(self):
+        """
+        Reset all observed values
+
+        """
+        # The last count is for values above the upper bound of the last bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Observe a value
+
+        Args:
+            value (float): The observed value
+
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def snapshot(self):
+        """
+        Get a snapshot of the histogram
+
+        Returns:
+            A dict with the cumulative bucket counts, sum and count
+
+        """
+        cumulative = 0
+        buckets = []
+        for le, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets.append((le, cumulative))
+
+        return {
+            'buckets': buckets,
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+    def merge(self, other):
+        """
+        Add the observed values of another histogram with the same buckets
+
+        Args:
+            other (Histogram): The histogram to merge
+
+        """
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.sum += other.sum
+        self.count += other.count
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+
+    return '{{{}}}'.format(','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+        for k, v in sorted(labels.items())
+    ))
+
+def format_prometheus(name, metric_type, samples):
+    """
+    Format a metric in the Prometheus text exposition format
+
+    Args:
+        name         (str): Name of the metric
+        metric_type  (str): One of 'counter', 'gauge' or 'histogram'
+        samples     (list): A list of (labels, value) tuples, where the
+                            value of a histogram is a Histogram snapshot
+
+    Returns:
+        The formatted metric
+
+    """
+    lines = ['# TYPE {} {}'.format(name, metric_type)]
+
+    for labels, value in samples:
+        if metric_type != 'histogram':
+            lines.append('{}{} {}'.format(name, _format_labels(labels), value))
+            continue
+
+        for le, count in value['buckets']:
+            bucket_labels = dict(labels or {})
+            bucket_labels['le'] = '+Inf' if le == float('inf') else repr(le)
+            lines.append('{}_bucket{} {}'.format(name, _format_labels(bucket_labels), count))
+
+        lines.append('{}_sum{} {}'.format(name, _format_labels(labels), value['sum']))
+        lines.append('{}_count{} {}'.format(name, _format_labels(labels), value['count']))
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,371 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector inventory mirror module
+
+"""
+
+import logging
+import threading
+
+import pyVmomi
+
+from vconnector.exceptions import VConnectorException
+
+__all__ = ['InventoryMirror']
+
+
+class InventoryMirror(object):
+    """
+    In-memory mirror of vSphere managed object properties
+
+    The InventoryMirror creates a persistent property filter on
+    the vSphere host and keeps an in-memory copy of the collected
+    properties up-to-date by applying the changes reported by
+    WaitForUpdatesEx(), so that only the objects which have
+    changed are transferred from the vSphere host.
+
+    The mirrored properties are stored in a dict keyed by the
+    managed object id. The initial synchronization, which may span
+    multiple truncated update sets, is built separately and published
+    once complete. Later updates replace the properties of each
+    changed object with a new dict, while holding a lock, so that
+    readers never see a partially updated object or update set.
+
+    """
+    def __init__(self,
+                 agent,
+                 obj_type,
+                 path_set=None,
+                 container=None,
+                 include_mors=False,
+                 wait_timeout=60,
+                 retry_interval=10):
+        """
+        Initializes a new InventoryMirror object
+
+        Args:
+            agent          (VConnector): A VConnector instance
+            obj_type    (pyVmomi.vim.*): Type of managed object to mirror
+            path_set             (list): List of properties to mirror
+            container (vim.ManagedEntity): Starting point of inventory search
+            include_mors         (bool): If True include the managed objects refs
+            wait_timeout          (int): Time in seconds to wait for updates
+                                         on each WaitForUpdatesEx() call
+            retry_interval        (int): Time in seconds to wait before
+                                         re-creating the property filter
+                                         after a failure
+
+        """
+        self.agent = agent
+        self.obj_type = obj_type
+        self.path_set = path_set
+        self.container = container
+        self.include_mors = include_mors
+        self.wait_timeout = wait_timeout
+        self.retry_interval = retry_interval
+
+        self.lock = threading.RLock()
+        self._store_lock = threading.Lock()
+        self._store = {}
+        self._staging = None
+        self._version = ''
+        self._view_ref = None
+        self._collector = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def __len__(self):
+        return len(self._store)
+
+    def __contains__(self, moid):
+        return moid in self._store
+
+    @property
+    def version(self):
+        return self._version
+
+    def snapshot(self):
+        """
+        Get a consistent snapshot of the mirrored inventory
+
+        The properties of the managed objects are never modified
+        by the mirror and should not be modified by the caller either.
+
+        Returns:
+            A dict of managed object id -> properties
+
+        """
+        with self._store_lock:
+            return dict(self._store)
+
+    def get(self, moid):
+        """
+        Get the mirrored properties of a managed object
+
+        Args:
+            moid (str): The managed object id
+
+        Returns:
+            The properties of the managed object if found, None otherwise
+
+        """
+        with self._store_lock:
+            return self._store.get(moid)
+
+    def _create_filter(self):
+        """
+        Create the property collector and filter used for mirroring
+
+        A dedicated property collector is used, so that the filter
+        does not interfere with other users of the session
+        property collector.
+
+        """
+        logging.debug(
+            '[%s] Creating property filter for %s managed objects',
+            self.agent.host,
+            self.obj_type.__name__
+        )
+
+        self._view_ref = self.agent.get_container_view(
+            obj_type=[self.obj_type],
+            container=self.container
+        )
+
+        filter_spec = self.agent._get_filter_spec(
+            view_ref=self._view_ref,
+            obj_type=self.obj_type,
+            path_set=self.path_set
+        )
+
+        self._collector = self.agent.content.propertyCollector.CreatePropertyCollector()
+        self._collector.CreateFilter(spec=filter_spec, partialUpdates=False)
+        self._version = ''
+        self._staging = None
+
+    def _destroy_filter(self):
+        """
+        Destroy the property collector, filter and view
+
+        """
+        collector, view_ref = self._collector, self._view_ref
+        self._collector, self._view_ref = None, None
+
+        for destroy in (getattr(collector, 'Destroy', None),
+                        getattr(view_ref, 'DestroyView', None)):
+            if destroy is None:
+                continue
+            try:
+                destroy()
+            except Exception as e:
+                logging.debug(
+                    '[%s] Cannot destroy property filter: %s',
+                    self.agent.host,
+                    e
+                )
+
+    def _apply(self, update_set):
+        """
+        Apply an update set to the mirrored inventory
+
+        The update sets of the initial synchronization contain all
+        objects as 'enter' updates and are collected in a staging
+        dict, which replaces the mirrored inventory once the last
+        truncated update set has been applied.
+
+        Args:
+            update_set (vmodl.query.PropertyCollector.UpdateSet): The update set
+
+        Returns:
+            The number of updated objects
+
+        """
+        if not self._version and self._staging is None:
+            self._staging = {}
+
+        if self._staging is not None:
+            updated = self._apply_changes(self._staging, update_set)
+        else:
+            with self._store_lock:
+                updated = self._apply_changes(self._store, update_set)
+
+        self._version = update_set.version
+
+        if self._staging is not None and not update_set.truncated:
+            with self._store_lock:
+                self._store = self._staging
+            self._staging = None
+
+        return updated
+
+    def _apply_changes(self, store, update_set):
+        """
+        Apply the changes of an update set to a store
+
+        The properties of each changed object are replaced
+        with a new dict instead of being modified in place.
+
+        Args:
+            store                                         (dict): The store to update
+            update_set (vmodl.query.PropertyCollector.UpdateSet): The update set
+
+        Returns:
+            The number of updated objects
+
+        """
+        updated = 0
+
+        for filter_update in update_set.filterSet:
+            for obj_update in filter_update.objectSet:
+                moid = obj_update.obj._moId
+
+                if obj_update.kind == 'leave':
+                    store.pop(moid, None)
+                    updated += 1
+                    continue
+
+                if obj_update.kind == 'enter':
+                    properties = {}
+                else:
+                    properties = dict(store.get(moid, {}))
+
+                for change in obj_update.changeSet:
+                    if change.op in ('remove', 'indirectRemove'):
+                        properties.pop(change.name, None)
+                    else:
+                        properties[change.name] = change.val
+
+                if self.include_mors:
+                    properties['obj'] = obj_update.obj
+
+                store[moid] = properties
+                updated += 1
+
+        return updated
+
+    def update(self, timeout=0):
+        """
+        Wait for updates from the vSphere host and apply them
+
+        Args:
+            timeout (int): Time in seconds to wait for updates
+
+        Returns:
+            The number of updated objects
+
+        """
+        with self.lock:
+            if self._collector is None:
+                self._create_filter()
+
+            options = pyVmomi.vmodl.query.PropertyCollector.WaitOptions()
+            options.maxWaitSeconds = timeout
+
+            updated = 0
+            while True:
+                update_set = self._collector.WaitForUpdatesEx(
+                    version=self._version,
+                    options=options
+                )
+                if update_set is None:
+                    break
+
+                updated += self._apply(update_set)
+                if not update_set.truncated:
+                    break
+
+            if updated:
+                logging.debug(
+                    '[%s] Applied updates for %d %s managed object(s)',
+                    self.agent.host,
+                    updated,
+                    self.obj_type.__name__
+                )
+
+            return updated
+
+    def _run(self):
+        """
+        Keep the mirrored inventory up-to-date until stopped
+
+        """
+        while not self._stopped.is_set():
+            try:
+                self.update(timeout=self.wait_timeout)
+            except Exception as e:
+                if self._stopped.is_set():
+                    break
+                logging.warning(
+                    '[%s] Cannot update mirrored inventory, re-creating property filter: %s',
+                    self.agent.host,
+                    e
+                )
+                with self.lock:
+                    self._destroy_filter()
+                self._stopped.wait(self.retry_interval)
+
+    def start(self):
+        """
+        Perform the initial synchronization and start
+        the background thread updating the mirror
+
+        Raises:
+            VConnectorException
+
+        """
+        if self._thread is not None:
+            raise VConnectorException('Inventory mirror is already running')
+
+        self.update()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop updating the mirror and destroy the property filter
+
+        """
+        self._stopped.set()
+
+        collector = self._collector
+        if collector is not None:
+            try:
+                collector.CancelWaitForUpdates()
+            except Exception as e:
+                logging.debug(
+                    '[%s] Cannot cancel waiting for updates: %s',
+                    self.agent.host,
+                    e
+                )
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        with self.lock:
+            self._destroy_filter()
@@ -0,0 +1,697 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector performance module
+
+"""
+
+import os
+import re
+import json
+import logging
+import tempfile
+import itertools
+
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import pyVmomi
+
+from vconnector.exceptions import VConnectorException
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = [
+    'PerfCounter',
+    'PerfCounterCatalog',
+    'PerfSample',
+    'PerfSeries',
+    'PerfMetricsCollector'
+]
+
+
+def _replace(src, dst):
+    """
+    Rename a file, replacing the destination file if it exists
+
+    Uses os.replace() where available, as os.rename() cannot
+    replace an existing file on Windows.
+
+    Args:
+        src (str): Path to the file to rename
+        dst (str): Path to the destination file
+
+    """
+    replace = getattr(os, 'replace', None)
+    if replace is not None:
+        replace(src, dst)
+        return
+
+    # Python 2 has no os.replace(), the destination file is
+    # removed first, which is not atomic on Windows
+    if os.name == 'nt' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
+
+
+PerfCounter = namedtuple(
+    'PerfCounter',
+    ['key', 'name', 'group', 'counter', 'rollup', 'unit',
+     'stats_type', 'level', 'per_device_level', 'label', 'summary']
+)
+
+PerfSample = namedtuple(
+    'PerfSample',
+    ['entity', 'counter', 'instance', 'timestamp', 'value']
+)
+
+PerfSeries = namedtuple(
+    'PerfSeries',
+    ['entity', 'counter', 'instance', 'timestamps', 'values']
+)
+
+
+class PerfCounterCatalog(object):
+    """
+    Indexed catalog of performance counters
+
+    Provides lookups of performance counters by id and by name in the
+    'group.counter.rollup' format, e.g. 'cpu.usage.average', as well
+    as grouping of the counters by level and managed entity type.
+
+    The catalog can be persisted to disk, so that the performance
+    counters do not have to be retrieved from the vSphere host on
+    every start. The 'path' attribute is the file the catalog was
+    last loaded from or saved to, if any, and discovered entity
+    types are saved to it as well.
+
+    """
+    def __init__(self, counters=(), instance_uuid=None, api_version=None, entity_types=None):
+        """
+        Initializes a new PerfCounterCatalog object
+
+        Args:
+            counters       (list): A list of PerfCounter instances
+            instance_uuid   (str): Instance UUID of the vSphere host
+            api_version     (str): API version of the vSphere host
+            entity_types   (dict): Managed entity type name -> list of counter ids
+
+        """
+        self.instance_uuid = instance_uuid
+        self.api_version = api_version
+        self.path = None
+        self.by_id = {}
+        self.by_name = {}
+        self.by_level = {}
+        self.by_entity_type = {}
+
+        for counter in counters:
+            self.by_id[counter.key] = counter
+            self.by_name[counter.name] = counter
+            self.by_level.setdefault(counter.level, []).append(counter.key)
+
+        for type_name, keys in (entity_types or {}).items():
+            self.by_entity_type[type_name] = set(keys)
+
+    def __len__(self):
+        return len(self.by_id)
+
+    def __iter__(self):
+        return iter(self.by_id.values())
+
+    def __contains__(self, key):
+        return key in self.by_id or key in self.by_name
+
+    def get(self, key):
+        """
+        Get a performance counter by id or by name
+
+        Args:
+            key (int or str): Id or name of the performance counter
+
+        Returns:
+            A PerfCounter instance if found, None otherwise
+
+        """
+        if key in self.by_id:
+            return self.by_id[key]
+
+        return self.by_name.get(key)
+
+    def id_of(self, name):
+        """
+        Get the id of a performance counter
+
+        Args:
+            name (str): Name of the performance counter, e.g. 'cpu.usage.average'
+
+        Returns:
+            The id of the performance counter
+
+        Raises:
+            VConnectorException
+
+        """
+        if name not in self.by_name:
+            raise VConnectorException('Unknown performance counter {}'.format(name))
+
+        return self.by_name[name].key
+
+    def name_of(self, key):
+        """
+        Get the name of a performance counter
+
+        Args:
+            key (int): Id of the performance counter
+
+        Returns:
+            The name of the performance counter
+
+        Raises:
+            VConnectorException
+
+        """
+        if key not in self.by_id:
+            raise VConnectorException('Unknown performance counter {}'.format(key))
+
+        return self.by_id[key].name
+
+    def get_level(self, level):
+        """
+        Get the performance counters of a level
+
+        Args:
+            level (int): The statistics level
+
+        Returns:
+            A list of PerfCounter instances
+
+        """
+        return [self.by_id[key] for key in self.by_level.get(level, [])]
+
+    def get_entity_type(self, obj_type):
+        """
+        Get the performance counters available for a managed entity type
+
+        Entity types have to be discovered first using discover_entity_type().
+
+        Args:
+            obj_type (pyVmomi.vim.*): Type of the managed entity
+
+        Returns:
+            A list of PerfCounter instances
+
+        """
+        keys = self.by_entity_type.get(obj_type.__name__, ())
+        return [self.by_id[key] for key in keys if key in self.by_id]
+
+    def discover_entity_type(self, agent, obj_type):
+        """
+        Discover the performance counters available for a managed entity type
+
+        The available counters are queried for a single managed
+        entity of the given type. If the catalog has a path the
+        catalog is saved with the discovered counters.
+
+        Args:
+            agent    (VConnector): A VConnector instance
+            obj_type (pyVmomi.vim.*): Type of the managed entity
+
+        Returns:
+            A list of PerfCounter instances
+
+        """
+        with agent.container_view(obj_type=[obj_type]) as view_ref:
+            entities = view_ref.view
+
+        if not entities:
+            logging.debug(
+                '[%s] No %s managed objects to discover performance counters for',
+                agent.host,
+                obj_type.__name__
+            )
+            return []
+
+        metrics = agent.content.perfManager.QueryAvailablePerfMetric(entity=entities[0])
+        self.by_entity_type[obj_type.__name__] = set(m.counterId for m in metrics or [])
+
+        if self.path:
+            try:
+                self.save(self.path)
+            except Exception as e:
+                logging.warning(
+                    '[%s] Cannot save performance counter catalog to %s: %s',
+                    agent.host,
+                    self.path,
+                    e
+                )
+
+        return self.get_entity_type(obj_type)
+
+    @classmethod
+    def from_perf_counters(cls, perf_counters, instance_uuid=None, api_version=None):
+        """
+        Create a catalog from the performance counters of a vSphere host
+
+        Args:
+            perf_counters (list): A list of vim.PerformanceManager.CounterInfo instances
+            instance_uuid  (str): Instance UUID of the vSphere host
+            api_version    (str): API version of the vSphere host
+
+        Returns:
+            A PerfCounterCatalog object
+
+        """
+        counters = []
+        for c in perf_counters:
+            counters.append(
+                PerfCounter(
+                    key=c.key,
+                    name='{}.{}.{}'.format(c.groupInfo.key, c.nameInfo.key, c.rollupType),
+                    group=c.groupInfo.key,
+                    counter=c.nameInfo.key,
+                    rollup=str(c.rollupType),
+                    unit=c.unitInfo.key,
+                    stats_type=str(c.statsType),
+                    level=c.level,
+                    per_device_level=c.perDeviceLevel,
+                    label=c.nameInfo.label,
+                    summary=c.nameInfo.summary
+                )
+            )
+
+        return cls(counters=counters, instance_uuid=instance_uuid, api_version=api_version)
+
+    def save(self, path):
+        """
+        Save the catalog to a file
+
+        The file is replaced atomically, so that concurrent
+        readers never see a partially written catalog.
+
+        Args:
+            path (str): Path to the catalog file
+
+        """
+        logging.debug('Saving performance counter catalog to %s', path)
+
+        data = {
+            'instance_uuid': self.instance_uuid,
+            'api_version': self.api_version,
+            'counters': [c._asdict() for c in self.by_id.values()],
+            'entity_types': dict(
+                (k, sorted(v)) for k, v in self.by_entity_type.items()
+            ),
+        }
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)))
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            _replace(tmp, path)
+        except Exception:
+            os.unlink(tmp)
+            raise
+
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a catalog from a file
+
+        Args:
+            path (str): Path to the catalog file
+
+        Returns:
+            A PerfCounterCatalog object
+
+        """
+        logging.debug('Loading performance counter catalog from %s', path)
+
+        with open(path) as f:
+            data = json.load(f)
+
+        catalog = cls(
+            counters=[PerfCounter(**c) for c in data['counters']],
+            instance_uuid=data['instance_uuid'],
+            api_version=data['api_version'],
+            entity_types=data.get('entity_types')
+        )
+        catalog.path = path
+
+        return catalog
+
+    @classmethod
+    def for_agent(cls, agent, cache_dir=None):
+        """
+        Get the catalog of a vSphere host
+
+        If a cache directory is given the catalog is loaded from it if
+        present, otherwise the performance counters are retrieved from
+        the vSphere host and the catalog is saved in the cache directory.
+        Catalog files are keyed by the instance UUID and API version
+        of the vSphere host.
+
+        Args:
+            agent (VConnector): A VConnector instance
+            cache_dir    (str): Path to the directory for catalog files
+
+        Returns:
+            A PerfCounterCatalog object
+
+        """
+        about = agent.content.about
+        instance_uuid = about.instanceUuid or agent.host
+        api_version = about.apiVersion
+
+        path = None
+        if cache_dir:
+            name = re.sub(r'[^\w.-]', '_', '{}-{}'.format(instance_uuid, api_version))
+            path = os.path.join(cache_dir, 'perf-counters-{}.json'.format(name))
+
+            if os.path.exists(path):
+                try:
+                    return cls.load(path)
+                except Exception as e:
+                    logging.warning(
+                        '[%s] Cannot load performance counter catalog from %s: %s',
+                        agent.host,
+                        path,
+                        e
+                    )
+
+        logging.debug('[%s] Retrieving performance counters', agent.host)
+
+        catalog = cls.from_perf_counters(
+            perf_counters=agent.perf_counter,
+            instance_uuid=instance_uuid,
+            api_version=api_version
+        )
+
+        if path:
+            # Entity types discovered later are saved to the same path
+            catalog.path = path
+            try:
+                catalog.save(path)
+            except Exception as e:
+                logging.warning(
+                    '[%s] Cannot save performance counter catalog to %s: %s',
+                    agent.host,
+                    path,
+                    e
+                )
+
+        return catalog
+
+
+class PerfMetricsCollector(object):
+    """
+    Collector of performance metrics for multiple managed entities
+
+    Splits the managed entities into batches of query specs, so that
+    each QueryPerf() call stays within the maximum number of metrics
+    per query allowed by the vSphere host, and issues the batches
+    concurrently. The metrics are requested in the compact CSV format.
+
+    When collecting all instances of the counters each counter
+    expands to one metric per instance, so the batches are sized
+    assuming 'wildcard_instances' instances per counter. Batches
+    which still exceed the limit are split by _query(). At most
+    'max_workers' batches are in flight at any time.
+
+    """
+    # Default of config.vpxd.stats.maxQueryMetrics on vCenter
+    DEFAULT_MAX_QUERY_METRICS = 64
+
+    def __init__(self, agent, max_workers=4, max_query_metrics=None, wildcard_instances=4):
+        """
+        Initializes a new PerfMetricsCollector object
+
+        Args:
+            agent       (VConnector): A VConnector instance
+            max_workers        (int): Maximum number of concurrent queries
+            max_query_metrics  (int): Maximum number of metrics per query,
+                                      defaults to the value of the
+                                      config.vpxd.stats.maxQueryMetrics
+                                      setting of the vSphere host
+            wildcard_instances (int): Assumed number of instances per counter
+                                      when collecting all instances, should be
+                                      raised for entities with many devices
+
+        """
+        self.agent = agent
+        self.max_workers = max_workers
+        self._max_query_metrics = max_query_metrics
+        self.wildcard_instances = wildcard_instances
+
+    @property
+    def max_query_metrics(self):
+        if self._max_query_metrics is None:
+            self._max_query_metrics = self._get_max_query_metrics()
+        return self._max_query_metrics
+
+    def _get_max_query_metrics(self):
+        """
+        Get the maximum number of metrics per query of the vSphere host
+
+        Returns:
+            The maximum number of metrics, or zero if unlimited
+
+        """
+        try:
+            option = self.agent.content.setting.QueryOptions(
+                name='config.vpxd.stats.maxQueryMetrics'
+            )
+            value = int(option[0].value)
+        except Exception as e:
+            logging.debug(
+                '[%s] Cannot get maximum number of metrics per query: %s',
+                self.agent.host,
+                e
+            )
+            return self.DEFAULT_MAX_QUERY_METRICS
+
+        # Negative values disable the limit
+        return max(value, 0)
+
+    def _batches(self, entities, metrics_per_entity):
+        """
+        Split managed entities into batches within the query limit
+
+        Args:
+            entities          (list): A list of managed entities
+            metrics_per_entity (int): Number of metrics per managed entity
+
+        Yields:
+            A list of managed entities per batch
+
+        """
+        limit = self.max_query_metrics
+        if limit:
+            batch_size = max(1, limit // max(1, metrics_per_entity))
+        else:
+            batch_size = len(entities) or 1
+
+        for i in range(0, len(entities), batch_size):
+            yield entities[i:i + batch_size]
+
+    def _query(self, specs):
+        """
+        Query the performance metrics for a batch of query specs
+
+        A batch rejected by the vSphere host, e.g. because it exceeds
+        the maximum number of metrics per query, is split in half and
+        queried again. A query spec of a single managed entity which
+        is rejected is logged and skipped.
+
+        Args:
+            specs (list): A list of vim.PerformanceManager.QuerySpec instances
+
+        Returns:
+            A list of vim.PerformanceManager.EntityMetricCSV instances
+
+        """
+        try:
+            return self.agent.content.perfManager.QueryPerf(querySpec=specs) or []
+        except pyVmomi.vmodl.fault.InvalidArgument as e:
+            if len(specs) == 1:
+                logging.warning(
+                    '[%s] Cannot query performance metrics for %s: %s',
+                    self.agent.host,
+                    specs[0].entity,
+                    e
+                )
+                return []
+
+        middle = len(specs) // 2
+        return self._query(specs[:middle]) + self._query(specs[middle:])
+
+    def _parse(self, result, as_arrays=False):
+        """
+        Parse the CSV formatted metrics of a managed entity
+
+        Args:
+            result (vim.PerformanceManager.EntityMetricCSV): The entity metrics
+            as_arrays                                 (bool): If True return a PerfSeries
+                                                              per counter and instance
+
+        Yields:
+            PerfSample or PerfSeries instances
+
+        """
+        catalog = self.agent.perf_catalog
+        timestamps = (result.sampleInfoCSV or '').split(',')[1::2]
+
+        for series in result.value:
+            counter = catalog.name_of(series.id.counterId)
+            values = [
+                int(v) if v else None
+                for v in (series.value or '').split(',')
+            ]
+
+            if as_arrays:
+                yield PerfSeries(
+                    entity=result.entity,
+                    counter=counter,
+                    instance=series.id.instance,
+                    timestamps=timestamps,
+                    values=numpy.array(
+                        [v if v is not None else -1 for v in values],
+                        dtype=numpy.int64
+                    )
+                )
+                continue
+
+            for timestamp, value in zip(timestamps, values):
+                yield PerfSample(
+                    entity=result.entity,
+                    counter=counter,
+                    instance=series.id.instance,
+                    timestamp=timestamp,
+                    value=value
+                )
+
+    def collect(self,
+                entities,
+                counters,
+                interval_id=20,
+                instance='*',
+                max_sample=1,
+                start_time=None,
+                end_time=None,
+                as_arrays=False):
+        """
+        Collect performance metrics for multiple managed entities
+
+        Args:
+            entities   (list or vim.view.View): Managed entities or a view ref
+            counters                    (list): Names of the performance counters,
+                                                e.g. ['cpu.usage.average']
+            interval_id                  (int): The sampling interval in seconds
+            instance                     (str): The counter instances to collect,
+                                                '*' for all instances and '' for
+                                                the aggregated value
+            max_sample                   (int): Maximum number of samples per metric
+            start_time     (datetime.datetime): Collect samples after this time
+            end_time       (datetime.datetime): Collect samples up to this time
+            as_arrays                   (bool): If True yield a PerfSeries per counter
+                                                and instance with NumPy arrays of values
+
+        Yields:
+            PerfSample instances, or PerfSeries instances if 'as_arrays' is True.
+            Missing values are None in samples and -1 in arrays
+
+        Raises:
+            VConnectorException
+
+        """
+        if as_arrays and numpy is None:
+            raise VConnectorException('NumPy is required for collecting metrics as arrays')
+
+        if hasattr(entities, 'view'):
+            entities = entities.view
+        entities = list(entities)
+
+        catalog = self.agent.perf_catalog
+        metric_ids = [
+            pyVmomi.vim.PerformanceManager.MetricId(
+                counterId=catalog.id_of(name),
+                instance=instance
+            )
+            for name in counters
+        ]
+
+        metrics_per_entity = len(metric_ids)
+        if instance == '*':
+            metrics_per_entity *= max(1, self.wildcard_instances)
+
+        batches = []
+        for batch in self._batches(entities, metrics_per_entity):
+            batches.append([
+                pyVmomi.vim.PerformanceManager.QuerySpec(
+                    entity=entity,
+                    metricId=metric_ids,
+                    intervalId=interval_id,
+                    maxSample=max_sample,
+                    startTime=start_time,
+                    endTime=end_time,
+                    format='csv'
+                )
+                for entity in batch
+            ])
+
+        logging.debug(
+            '[%s] Collecting %d metric(s) for %d managed entities in %d batch(es)',
+            self.agent.host,
+            len(metric_ids),
+            len(entities),
+            len(batches)
+        )
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        remaining = iter(batches)
+        pending = set()
+        try:
+            while True:
+                # Submit new batches only as the previous ones complete
+                for specs in itertools.islice(remaining, self.max_workers - len(pending)):
+                    pending.add(executor.submit(self._query, specs))
+
+                if not pending:
+                    break
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for f in done:
+                    for result in f.result():
+                        for item in self._parse(result, as_arrays=as_arrays):
+                            yield item
+        finally:
+            for f in pending:
+                f.cancel()
+            executor.shutdown(wait=False)
@@ -0,0 +1,614 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector pool module
+
+"""
+
+import socket
+import logging
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+try:
+    from http.client import HTTPException
+except ImportError:
+    from httplib import HTTPException
+
+from time import time
+from collections import namedtuple
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import pyVmomi
+
+from vconnector.core import VConnector
+from vconnector.core import VConnectorDatabase
+from vconnector.instrument import Instrumentation
+from vconnector.sharedcache import MemorySharedCache
+from vconnector.exceptions import VConnectorException
+
+__all__ = ['AgentResult', 'VConnectorPool', 'VConnectorSessionPool']
+
+AgentResult = namedtuple('AgentResult', ['host', 'result', 'error'])
+
+# Errors after which a session can no longer be used
+_SESSION_ERRORS = (
+    pyVmomi.vim.fault.NotAuthenticated,
+    socket.error,
+    HTTPException,
+)
+
+
+class VConnectorPool(object):
+    """
+    VConnectorPool class
+
+    Runs operations against multiple vSphere Agents concurrently
+    using a bounded pool of threads and streams back the results
+    of each vSphere Agent as soon as they are available.
+
+    """
+    def __init__(self, agents, max_workers=8, timeout=None):
+        """
+        Initializes a new VConnectorPool object
+
+        Args:
+            agents      (list): A list of VConnector instances
+            max_workers  (int): Maximum number of vSphere Agents to
+                                run operations against concurrently
+            timeout      (int): Time in seconds after which an operation
+                                against a single vSphere Agent is
+                                considered as failed
+
+        """
+        if max_workers < 1:
+            raise VConnectorException('Number of workers should be at least one')
+
+        self.agents = list(agents)
+        self.max_workers = max_workers
+        self.timeout = timeout
+
+    def __len__(self):
+        return len(self.agents)
+
+    @classmethod
+    def from_db(cls, db, max_workers=8, timeout=None, **kwargs):
+        """
+        Create a VConnectorPool for the enabled vSphere Agents
+        from a vConnector database
+
+        Args:
+            db           (str): Path to the SQLite database file
+            max_workers  (int): Maximum number of vSphere Agents to
+                                run operations against concurrently
+            timeout      (int): Time in seconds after which an operation
+                                against a single vSphere Agent is
+                                considered as failed
+            kwargs      (dict): Additional keyword arguments passed
+                                to each VConnector instance
+
+        Returns:
+            A VConnectorPool object
+
+        """
+        db = VConnectorDatabase(db)
+        try:
+            rows = db.get_agents(only_enabled=True)
+        finally:
+            db.close()
+
+        agents = [
+            VConnector(
+                user=row['user'],
+                pwd=row['pwd'],
+                host=row['host'],
+                **kwargs
+            )
+            for row in rows
+        ]
+
+        return cls(agents=agents, max_workers=max_workers, timeout=timeout)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Run a callable against all vSphere Agents concurrently
+
+        The callable is called with the VConnector instance as
+        the first argument, followed by any additional arguments.
+
+        Errors, including timeouts, are reported per vSphere Agent
+        and do not stop the operation for the remaining Agents.
+
+        An operation which has timed out no longer counts against
+        the maximum number of concurrent operations, so that hung
+        vSphere Agents do not hold up the remaining Agents.
+
+        Args:
+            func (callable): The callable to run against each Agent
+
+        Yields:
+            An AgentResult for each vSphere Agent, in order of completion
+
+        """
+        results = queue.Queue()
+        waiting = list(enumerate(self.agents))
+        running = {}
+
+        def call(i, agent):
+            try:
+                results.put((i, func(agent, *args, **kwargs), None))
+            except Exception as e:
+                results.put((i, None, e))
+
+        while waiting or running:
+            while waiting and len(running) < self.max_workers:
+                i, agent = waiting.pop(0)
+                t = threading.Thread(target=call, args=(i, agent))
+                t.daemon = True
+                running[i] = (agent, time())
+                t.start()
+
+            wait_timeout = None
+            if self.timeout is not None:
+                oldest = min(started for _, started in running.values())
+                wait_timeout = max(0, oldest + self.timeout - time())
+
+            try:
+                i, result, error = results.get(timeout=wait_timeout)
+            except queue.Empty:
+                i = None
+
+            # Results of operations which have timed out are dropped
+            if i in running:
+                agent, _ = running.pop(i)
+                if error is not None:
+                    logging.warning('[%s] Operation failed: %s', agent.host, error)
+                yield AgentResult(agent.host, result, error)
+
+            if self.timeout is None:
+                continue
+
+            now = time()
+            for i, (agent, started) in list(running.items()):
+                if now - started < self.timeout:
+                    continue
+
+                # The slot is released, while the thread of the hung
+                # operation is left to finish in the background
+                del running[i]
+                logging.warning(
+                    '[%s] Operation timed out after %s seconds',
+                    agent.host,
+                    self.timeout
+                )
+                yield AgentResult(
+                    agent.host,
+                    None,
+                    VConnectorException('Operation timed out after {} seconds'.format(self.timeout))
+                )
+
+    def collect_properties(self,
+                           obj_type,
+                           path_set=None,
+                           include_mors=False,
+                           page_size=None):
+        """
+        Collect properties for managed objects from all vSphere Agents
+
+        Args:
+            obj_type      (pyVmomi.vim.*): Type of managed object
+            path_set               (list): List of properties to retrieve
+            include_mors           (bool): If True include the managed objects refs in the result
+            page_size               (int): Maximum number of objects to retrieve per page
+
+        Yields:
+            An AgentResult for each vSphere Agent, in order of completion
+
+        """
+        def collect(agent):
+            with agent.container_view(obj_type=[obj_type]) as view_ref:
+                return agent.collect_properties(
+                    view_ref=view_ref,
+                    obj_type=obj_type,
+                    path_set=path_set,
+                    include_mors=include_mors,
+                    page_size=page_size
+                )
+
+        return self.run(collect)
+
+    def disconnect(self):
+        """
+        Disconnect all vSphere Agents
+
+        """
+        for agent in self.agents:
+            try:
+                agent.disconnect()
+            except Exception as e:
+                logging.warning('[%s] Cannot disconnect: %s', agent.host, e)
+
+
+class VConnectorSessionPool(object):
+    """
+    VConnectorSessionPool class
+
+    Keeps a pool of authenticated sessions to a single vSphere
+    host, so that concurrent operations against the host do not
+    have to share a single session and stub, and do not have to
+    login for each operation.
+
+    Each session is a VConnector instance, which is checked out
+    for the duration of an operation and returned to the pool
+    afterwards. Sessions are created when needed, up to the size
+    of the pool, and checked for being alive when checked out.
+    Sessions which fail with an error other than a vSphere fault
+    are discarded and replaced by a new session when needed.
+
+    Each session keeps its own object cache, as managed objects
+    are bound to the session which retrieved them. The results of
+    lookups are shared between the sessions by managed object type
+    and id through a second-tier cache, and the instrumentation is
+    shared by all sessions of the pool.
+
+    """
+    def __init__(self, user, pwd, host, size=4, timeout=None, **kwargs):
+        """
+        Initializes a new VConnectorSessionPool object
+
+        Args:
+            user     (str): Username to use when connecting
+            pwd      (str): Password to use when connecting
+            host     (str): The vSphere host to connect to
+            size     (int): Maximum number of sessions
+            timeout  (int): Time in seconds to wait for a session
+                            to become available, None waits forever
+            kwargs  (dict): Additional keyword arguments passed
+                            to each VConnector instance
+
+        Raises:
+            VConnectorException
+
+        """
+        if size < 1:
+            raise VConnectorException('Number of sessions should be at least one')
+
+        if kwargs.get('session_db'):
+            raise VConnectorException('A session database cannot be used with a session pool')
+
+        self.user = user
+        self.pwd = pwd
+        self.host = host
+        self.size = size
+        self.timeout = timeout
+        self.agent_kwargs = kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []
+        self._count = 0
+        self._closed = False
+
+        self.instrumentation = Instrumentation(
+            host=self.host,
+            enabled=kwargs.get('instrumentation_enabled', False)
+        )
+        self._shared_cache = None
+        if kwargs.get('cache_enabled') and not kwargs.get('cache_shared_path'):
+            self._shared_cache = MemorySharedCache()
+
+    def __len__(self):
+        return self._count
+
+    def _create_agent(self):
+        """
+        Create and connect a new session
+
+        Returns:
+            A VConnector instance
+
+        """
+        agent = VConnector(
+            user=self.user,
+            pwd=self.pwd,
+            host=self.host,
+            **self.agent_kwargs
+        )
+
+        # Managed objects are bound to the stub of the session which
+        # retrieved them, so only the per-session caches hold objects,
+        # while the sessions share their lookups by type and id
+        if self._shared_cache is not None and agent.cache_shared is None:
+            agent.cache_shared = self._shared_cache
+        agent.instrumentation = self.instrumentation
+
+        agent.connect()
+
+        return agent
+
+    def _acquire(self):
+        """
+        Check out an idle session, creating a new one if needed
+
+        Raises:
+            VConnectorException
+
+        Returns:
+            A VConnector instance
+
+        """
+        deadline = None if self.timeout is None else time() + self.timeout
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise VConnectorException('Session pool is closed')
+
+                if self._idle:
+                    return self._idle.pop()
+
+                if self._count < self.size:
+                    self._count += 1
+                    count = self._count
+                    break
+
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        raise VConnectorException(
+                            'Timed out waiting for a session to {}'.format(self.host)
+                        )
+                self._cond.wait(remaining)
+
+        logging.debug(
+            '[%s] Creating session %d of %d in session pool',
+            self.host,
+            count,
+            self.size
+        )
+
+        try:
+            return self._create_agent()
+        except Exception:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            raise
+
+    def _release(self, agent, discard=False):
+        """
+        Return a session to the pool
+
+        Args:
+            agent (VConnector): The session to return
+            discard     (bool): If True disconnect the session
+                                instead of returning it
+
+        """
+        with self._cond:
+            discard = discard or self._closed
+            if discard:
+                self._count -= 1
+            else:
+                self._idle.append(agent)
+            self._cond.notify()
+
+        if discard:
+            logging.debug('[%s] Discarding session from session pool', self.host)
+            try:
+                agent.disconnect()
+            except Exception as e:
+                logging.warning('[%s] Cannot disconnect: %s', self.host, e)
+
+    @contextmanager
+    def session(self):
+        """
+        Context manager checking out a session from the pool
+
+        The session is returned to the pool when the context exits,
+        unless it has failed with a connection or authentication
+        error, in which case it is disconnected and discarded.
+
+        Yields:
+            A VConnector instance
+
+        """
+        agent = self._acquire()
+
+        try:
+            # Checks the session if not used recently and reconnects if needed
+            agent.si
+        except Exception:
+            self._release(agent, discard=True)
+            raise
+
+        discard = False
+        try:
+            yield agent
+        except _SESSION_ERRORS:
+            discard = True
+            raise
+        finally:
+            self._release(agent, discard=discard)
+
+    def run(self, func, *args, **kwargs):
+        """
+        Run a callable with a session checked out from the pool
+
+        The callable is called with the VConnector instance as
+        the first argument, followed by any additional arguments.
+
+        Args:
+            func (callable): The callable to run
+
+        Returns:
+            The result of the callable
+
+        """
+        with self.session() as agent:
+            return func(agent, *args, **kwargs)
+
+    def collect_properties(self,
+                           obj_type,
+                           path_set=None,
+                           container=None,
+                           include_mors=False,
+                           page_size=None):
+        """
+        Collect properties for managed objects
+
+        View refs belong to the session which created them, so a
+        pooled container view of the checked out session is used.
+
+        Args:
+            obj_type          (pyVmomi.vim.*): Type of managed object
+            path_set                   (list): List of properties to retrieve
+            container (vim.ManagedEntity): Starting point of inventory search
+            include_mors               (bool): If True include the managed objects refs in the result
+            page_size                   (int): Maximum number of objects to retrieve per page
+
+        Returns:
+            A list of properties for the managed objects
+
+        """
+        with self.session() as agent:
+            with agent.container_view(obj_type=[obj_type], container=container) as view_ref:
+                return agent.collect_properties(
+                    view_ref=view_ref,
+                    obj_type=obj_type,
+                    path_set=path_set,
+                    include_mors=include_mors,
+                    page_size=page_size
+                )
+
+    def collect_properties_by_type(self,
+                                   path_sets,
+                                   container=None,
+                                   include_mors=False,
+                                   page_size=None):
+        """
+        Collect properties for managed objects of multiple types at once
+
+        See VConnector.collect_properties_by_type() for details.
+
+        """
+        return self.run(
+            VConnector.collect_properties_by_type,
+            path_sets=path_sets,
+            container=container,
+            include_mors=include_mors,
+            page_size=page_size
+        )
+
+    def collect_properties_for(self,
+                               objs,
+                               path_set=None,
+                               obj_type=None,
+                               include_mors=False,
+                               batch_size=500,
+                               use_views=False):
+        """
+        Collect properties for an explicit list of managed objects
+
+        Each batch is collected using a separate session from the pool.
+
+        See VConnector.collect_properties_for() for details.
+
+        """
+        objs = list(objs)
+        batches = [objs[i:i + batch_size] for i in range(0, len(objs), batch_size)]
+
+        def collect(batch):
+            return self.run(
+                VConnector.collect_properties_for,
+                objs=batch,
+                path_set=path_set,
+                obj_type=obj_type,
+                include_mors=include_mors,
+                batch_size=batch_size,
+                max_workers=1,
+                use_views=use_views
+            )
+
+        if len(batches) <= 1:
+            results = [collect(batch) for batch in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.size, len(batches))) as executor:
+                results = list(executor.map(collect, batches))
+
+        return [properties for result in results for properties in result]
+
+    def get_object_by_property(self, property_name, property_value, obj_type):
+        """
+        Find a Managed Object by a propery
+
+        See VConnector.get_object_by_property() for details.
+
+        """
+        return self.run(
+            VConnector.get_object_by_property,
+            property_name=property_name,
+            property_value=property_value,
+            obj_type=obj_type
+        )
+
+    def get_objects_by_property(self, property_name, property_values, obj_type):
+        """
+        Find multiple Managed Objects by a property
+
+        See VConnector.get_objects_by_property() for details.
+
+        """
+        return self.run(
+            VConnector.get_objects_by_property,
+            property_name=property_name,
+            property_values=property_values,
+            obj_type=obj_type
+        )
+
+    def close(self):
+        """
+        Disconnect all sessions of the pool
+
+        Sessions which are checked out are disconnected
+        when they are returned to the pool.
+
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._count -= len(idle)
+            self._cond.notify_all()
+
+        for agent in idle:
+            try:
+                agent.disconnect()
+            except Exception as e:
+                logging.warning('[%s] Cannot disconnect: %s', self.host, e)
@@ -0,0 +1,244 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector relations module
+
+"""
+
+import pyVmomi
+
+from vconnector.exceptions import VConnectorException
+
+__all__ = [
+    'Relation',
+    'check_relations',
+    'get_relation_specs',
+    'get_relation_path_sets',
+    'join_relations'
+]
+
+
+class Relation(object):
+    """
+    Reference from a managed object to related managed objects
+
+    A relation is followed on the vSphere host by a traversal
+    spec, so that the properties of the related objects are
+    retrieved by the same property collector call as the
+    properties of the managed objects referencing them.
+
+    Example:
+        Relation(
+            path='runtime.host',
+            obj_type=pyVmomi.vim.HostSystem,
+            path_set=['name'],
+            relations=[
+                Relation(
+                    path='parent',
+                    obj_type=pyVmomi.vim.ClusterComputeResource,
+                    path_set=['name']
+                )
+            ]
+        )
+
+    """
+    def __init__(self, path, obj_type, path_set=None, relations=None, name=None):
+        """
+        Initializes a new Relation object
+
+        Args:
+            path               (str): Property holding the managed object
+                                      ref(s) of the related objects
+            obj_type (pyVmomi.vim.*): Type of the related managed objects
+            path_set          (list): List of properties to retrieve for
+                                      the related objects
+            relations         (list): Relations of the related objects
+            name               (str): Key of the related objects in the
+                                      joined rows, defaults to the path
+
+        """
+        self.path = path
+        self.obj_type = obj_type
+        self.path_set = path_set
+        self.relations = relations or []
+        self.name = name or path
+
+    def __repr__(self):
+        return 'Relation(path={!r}, obj_type={})'.format(self.path, self.obj_type.__name__)
+
+
+def check_relations(obj_type, relations):
+    """
+    Check that relations can be joined to managed objects of a type
+
+    The joined managed objects are told apart from the related
+    objects by their type, so related objects must be of a
+    different type.
+
+    Args:
+        obj_type (pyVmomi.vim.*): Type of the managed objects
+        relations         (list): List of Relation instances
+
+    Raises:
+        VConnectorException
+
+    """
+    stack = list(relations)
+    while stack:
+        relation = stack.pop()
+        if issubclass(obj_type, relation.obj_type) or issubclass(relation.obj_type, obj_type):
+            raise VConnectorException(
+                'Related objects must be of a different type than {} managed objects'.format(
+                    obj_type.__name__
+                )
+            )
+        stack.extend(relation.relations)
+
+
+def get_relation_specs(obj_type, relations, prefix=None):
+    """
+    Create the traversal specs following relations of a managed object type
+
+    Args:
+        obj_type (pyVmomi.vim.*): Type of the managed objects
+        relations         (list): List of Relation instances
+        prefix             (str): Prefix of the traversal spec names
+
+    Returns:
+        A list of vmodl.query.PropertyCollector.TraversalSpec instances
+
+    """
+    prefix = prefix or obj_type.__name__
+    specs = []
+
+    for relation in relations:
+        name = '{}.{}'.format(prefix, relation.path)
+        spec = pyVmomi.vmodl.query.PropertyCollector.TraversalSpec()
+        spec.name = name
+        spec.type = obj_type
+        spec.path = relation.path
+        spec.skip = False
+        spec.selectSet = get_relation_specs(
+            obj_type=relation.obj_type,
+            relations=relation.relations,
+            prefix=name
+        )
+        specs.append(spec)
+
+    return specs
+
+
+def get_relation_path_sets(obj_type, path_set, relations, path_sets=None):
+    """
+    Get the properties to retrieve for each managed object type
+
+    The paths of the relations are added to the path sets, as
+    they are needed for joining the related objects. Path sets
+    of the same type are merged.
+
+    Args:
+        obj_type (pyVmomi.vim.*): Type of the managed objects
+        path_set          (list): List of properties to retrieve
+        relations         (list): List of Relation instances
+        path_sets         (dict): Path sets collected so far
+
+    Returns:
+        A dict of managed object type -> list of properties, where
+        None means that all properties are retrieved
+
+    """
+    if path_sets is None:
+        path_sets = {}
+
+    if not path_set:
+        path_sets[obj_type] = None
+    elif path_sets.get(obj_type, []) is not None:
+        paths = path_sets.setdefault(obj_type, [])
+        for path in list(path_set) + [r.path for r in relations]:
+            if path not in paths:
+                paths.append(path)
+
+    for relation in relations:
+        get_relation_path_sets(
+            obj_type=relation.obj_type,
+            path_set=relation.path_set,
+            relations=relation.relations,
+            path_sets=path_sets
+        )
+
+    return path_sets
+
+
+def join_relations(contents, obj_type, relations, include_mors=False):
+    """
+    Join the collected properties of managed objects and their related objects
+
+    Related objects are deduplicated by their managed object id,
+    so that rows referencing the same object share the same dict
+    of its properties. Related objects which were not retrieved,
+    e.g. due to missing permissions, are None.
+
+    Args:
+        contents  (dict): Mapping of managed object id to
+                          vmodl.query.PropertyCollector.ObjectContent
+        obj_type (pyVmomi.vim.*): Type of the managed objects
+        relations   (list): List of Relation instances
+        include_mors (bool): If True include the managed objects refs in the result
+
+    Returns:
+        A list of joined properties for the managed objects
+
+    """
+    properties = {}
+    for moid, content in contents.items():
+        props = dict((prop.name, prop.val) for prop in content.propSet)
+        if include_mors:
+            props['obj'] = content.obj
+        properties[moid] = props
+
+    joined = {}
+
+    def join(props, relations):
+        row = dict(props)
+        for relation in relations:
+            ref = props.get(relation.path)
+            if isinstance(ref, (list, tuple)):
+                row[relation.name] = [resolve(r, relation) for r in ref]
+            elif ref is not None:
+                row[relation.name] = resolve(ref, relation)
+        return row
+
+    def resolve(ref, relation):
+        key = (ref._moId, id(relation))
+        if key not in joined:
+            props = properties.get(ref._moId)
+            joined[key] = join(props, relation.relations) if props is not None else None
+        return joined[key]
+
+    return [
+        join(properties[moid], relations)
+        for moid, content in contents.items()
+        if isinstance(content.obj, obj_type)
+    ]
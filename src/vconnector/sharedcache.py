@@ -0,0 +1,323 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector shared cache module
+
+"""
+
+import os
+import logging
+import sqlite3
+import threading
+
+from time import time
+from collections import namedtuple
+
+__all__ = ['SharedCacheEntry', 'SQLiteSharedCache', 'MemorySharedCache']
+
+SharedCacheEntry = namedtuple('SharedCacheEntry', ['name', 'obj_type', 'moid', 'expires'])
+
+
+class SQLiteSharedCache(object):
+    """
+    Second-tier cache of managed object references shared between processes
+
+    Stores managed object references in serialized form, i.e. the
+    managed object type and id, in an SQLite database in WAL mode,
+    so that multiple processes on the same system can share the
+    results of their lookups. Entries with no type and id are
+    negative cache entries.
+
+    Each thread and process uses its own database connection, so
+    the cache can be used from pre-forked worker processes.
+
+    Expired entries are removed after every 'purge_interval' entries
+    written, so that the database does not grow without bound.
+
+    """
+    def __init__(self, path, timeout=5.0, purge_interval=1000):
+        """
+        Initializes a new SQLiteSharedCache object
+
+        Args:
+            path           (str): Path to the SQLite database file
+            timeout      (float): Time in seconds to wait for a locked database
+            purge_interval (int): Number of written entries after which the
+                                  expired entries are removed, zero disables it
+
+        """
+        self.path = path
+        self.timeout = timeout
+        self.purge_interval = purge_interval
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+        self._local = threading.local()
+        self._init_db()
+
+    @property
+    def conn(self):
+        # Connections cannot be shared between threads or forked processes
+        if getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _count_writes(self, count):
+        """
+        Count written entries and check if the expired entries should be removed
+
+        Args:
+            count (int): Number of written entries
+
+        Returns:
+            True if the expired entries should be removed, False otherwise
+
+        """
+        if self.purge_interval <= 0:
+            return False
+
+        with self._writes_lock:
+            self._writes += count
+            if self._writes < self.purge_interval:
+                return False
+            self._writes = 0
+
+        return True
+
+    def _init_db(self):
+        """
+        Creates the cache table if it does not exist yet
+
+        """
+        sql = """
+        CREATE TABLE IF NOT EXISTS cache (
+            host TEXT,
+            name TEXT,
+            type TEXT,
+            moid TEXT,
+            expires REAL,
+            PRIMARY KEY (host, name)
+        )
+        """
+
+        with self.conn:
+            self.conn.execute(sql)
+
+    def get(self, host, name):
+        """
+        Get an entry from the shared cache
+
+        Args:
+            host (str): Hostname of the vSphere host
+            name (str): Name of the cache entry
+
+        Returns:
+            A SharedCacheEntry if found and not expired, None otherwise
+
+        """
+        row = self.conn.execute(
+            'SELECT type, moid, expires FROM cache WHERE host = ? AND name = ? AND expires > ?',
+            (host, name, time())
+        ).fetchone()
+
+        if row is None:
+            return None
+
+        return SharedCacheEntry(name, row[0], row[1], row[2])
+
+    def add_many(self, host, entries):
+        """
+        Add multiple entries to the shared cache
+
+        Args:
+            host     (str): Hostname of the vSphere host
+            entries (list): A list of SharedCacheEntry instances
+
+        """
+        rows = [(host, e.name, e.obj_type, e.moid, e.expires) for e in entries]
+        with self.conn:
+            self.conn.executemany('INSERT OR REPLACE INTO cache VALUES (?,?,?,?,?)', rows)
+
+        if self._count_writes(len(rows)):
+            self.remove_expired()
+
+    def add(self, host, entry):
+        """
+        Add an entry to the shared cache
+
+        Args:
+            host              (str): Hostname of the vSphere host
+            entry (SharedCacheEntry): The cache entry
+
+        """
+        self.add_many(host, [entry])
+
+    def remove_expired(self):
+        """
+        Remove the expired entries from the shared cache
+
+        Returns:
+            The number of removed entries
+
+        """
+        with self.conn:
+            cursor = self.conn.execute('DELETE FROM cache WHERE expires <= ?', (time(),))
+
+        logging.debug('Removed %d expired entries from shared cache', cursor.rowcount)
+        return cursor.rowcount
+
+    def clear(self, host=None):
+        """
+        Remove all entries from the shared cache
+
+        Args:
+            host (str): Remove only the entries of this vSphere host
+
+        """
+        with self.conn:
+            if host is None:
+                self.conn.execute('DELETE FROM cache')
+            else:
+                self.conn.execute('DELETE FROM cache WHERE host = ?', (host,))
+
+
+class MemorySharedCache(object):
+    """
+    Second-tier cache of managed object references shared between sessions
+
+    In-memory equivalent of SQLiteSharedCache for sharing lookup
+    results between multiple sessions within a single process.
+    Only the managed object type and id are stored, so that each
+    session re-creates the managed objects bound to its own stub.
+
+    Expired entries are removed after every 'purge_interval' entries
+    written, so that the cache does not grow without bound.
+
+    """
+    def __init__(self, purge_interval=1000):
+        """
+        Initializes a new MemorySharedCache object
+
+        Args:
+            purge_interval (int): Number of written entries after which the
+                                  expired entries are removed, zero disables it
+
+        """
+        self.purge_interval = purge_interval
+        self.lock = threading.Lock()
+        self._writes = 0
+        self._entries = {}
+
+    def __len__(self):
+        with self.lock:
+            return len(self._entries)
+
+    def get(self, host, name):
+        """
+        Get an entry from the shared cache
+
+        Args:
+            host (str): Hostname of the vSphere host
+            name (str): Name of the cache entry
+
+        Returns:
+            A SharedCacheEntry if found and not expired, None otherwise
+
+        """
+        with self.lock:
+            entry = self._entries.get((host, name))
+
+        if entry is None or entry.expires <= time():
+            return None
+
+        return entry
+
+    def add_many(self, host, entries):
+        """
+        Add multiple entries to the shared cache
+
+        Args:
+            host     (str): Hostname of the vSphere host
+            entries (list): A list of SharedCacheEntry instances
+
+        """
+        purge = False
+        with self.lock:
+            for entry in entries:
+                self._entries[(host, entry.name)] = entry
+                self._writes += 1
+
+            if 0 < self.purge_interval <= self._writes:
+                self._writes = 0
+                purge = True
+
+        if purge:
+            self.remove_expired()
+
+    def add(self, host, entry):
+        """
+        Add an entry to the shared cache
+
+        Args:
+            host              (str): Hostname of the vSphere host
+            entry (SharedCacheEntry): The cache entry
+
+        """
+        self.add_many(host, [entry])
+
+    def remove_expired(self):
+        """
+        Remove the expired entries from the shared cache
+
+        Returns:
+            The number of removed entries
+
+        """
+        now = time()
+        with self.lock:
+            expired = [k for k, e in self._entries.items() if e.expires <= now]
+            for key in expired:
+                del self._entries[key]
+
+        logging.debug('Removed %d expired entries from shared cache', len(expired))
+        return len(expired)
+
+    def clear(self, host=None):
+        """
+        Remove all entries from the shared cache
+
+        Args:
+            host (str): Remove only the entries of this vSphere host
+
+        """
+        with self.lock:
+            if host is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == host]:
+                    del self._entries[key]
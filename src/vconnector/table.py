@@ -0,0 +1,309 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector columnar results module
+
+"""
+
+import re
+import numbers
+
+from array import array
+
+from vconnector.exceptions import VConnectorException
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = ['PropertyTable', 'PropertyTableBuilder', 'record_class']
+
+# Type code of the integer columns, the 'q' type code
+# is not available in Python 2
+try:
+    array('q')
+    _INT_TYPECODE = 'q'
+except ValueError:
+    _INT_TYPECODE = 'l'
+
+# NumPy dtypes of the array type codes used for numeric columns,
+# the 'l' type code is the platform C long in both modules
+_NUMPY_DTYPES = {
+    'q': 'int64',
+    'l': 'l',
+    'd': 'float64',
+}
+
+
+class _Column(object):
+    """
+    Column of property values
+
+    Integer and float values are stored in an array.array with
+    the 'q' (or 'l' in Python 2) and 'd' type codes respectively. A column falls back
+    to a list as soon as a value of any other type is appended,
+    including a missing value.
+
+    """
+    __slots__ = ('values', 'typecode')
+
+    def __init__(self):
+        self.values = None
+        self.typecode = None
+
+    def _demote(self):
+        self.values = list(self.values)
+        self.typecode = None
+
+    def append(self, value):
+        if self.values is None:
+            if isinstance(value, numbers.Integral) and not isinstance(value, bool):
+                self.values, self.typecode = array(_INT_TYPECODE), _INT_TYPECODE
+            elif isinstance(value, float):
+                self.values, self.typecode = array('d'), 'd'
+            else:
+                self.values = []
+
+        if self.typecode is None:
+            self.values.append(value)
+            return
+
+        if isinstance(value, bool) or not isinstance(value, (numbers.Integral, float)):
+            self._demote()
+        elif self.typecode == _INT_TYPECODE and isinstance(value, float):
+            self.values, self.typecode = array('d', self.values), 'd'
+
+        try:
+            self.values.append(value)
+        except OverflowError:
+            self._demote()
+            self.values.append(value)
+
+    def pad(self, count):
+        """
+        Append missing values until the column has 'count' values
+
+        """
+        if self.values is None:
+            self.values = []
+        elif len(self.values) < count and self.typecode is not None:
+            self._demote()
+
+        self.values.extend([None] * (count - len(self.values)))
+
+
+class PropertyTable(object):
+    """
+    Properties of managed objects stored in columns
+
+    Each property path is stored in a separate column, where
+    numeric columns are stored in array.array or NumPy arrays
+    and all other columns are lists. The managed object refs are
+    stored in the 'obj' column, if requested.
+
+    """
+    def __init__(self, paths, columns, length):
+        """
+        Initializes a new PropertyTable object
+
+        Args:
+            paths   (tuple): The property paths in column order
+            columns  (dict): The columns keyed by property path
+            length    (int): The number of rows
+
+        """
+        self.paths = paths
+        self.columns = columns
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, path):
+        return path in self.columns
+
+    def __getitem__(self, path):
+        return self.columns[path]
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self.row(i)
+
+    def row(self, i):
+        """
+        Get a single row of the table
+
+        Args:
+            i (int): Index of the row
+
+        Returns:
+            A dict with the properties of the managed object
+
+        """
+        return dict((path, column[i]) for path, column in self.columns.items())
+
+    def to_numpy(self):
+        """
+        Convert the numeric columns to NumPy arrays
+
+        The arrays share the memory of the numeric columns.
+
+        Raises:
+            VConnectorException
+
+        Returns:
+            A new PropertyTable instance
+
+        """
+        if numpy is None:
+            raise VConnectorException('NumPy is required for converting columns to arrays')
+
+        columns = {}
+        for path, column in self.columns.items():
+            if isinstance(column, array):
+                column = numpy.frombuffer(column, dtype=_NUMPY_DTYPES[column.typecode])
+            columns[path] = column
+
+        return PropertyTable(self.paths, columns, self._length)
+
+
+class PropertyTableBuilder(object):
+    """
+    Builds a PropertyTable from object contents
+
+    """
+    def __init__(self, path_set, include_mors=False):
+        """
+        Initializes a new PropertyTableBuilder object
+
+        Args:
+            path_set     (list): List of property paths, one column per path
+            include_mors (bool): If True add a column with the managed object refs
+
+        """
+        if not path_set:
+            raise VConnectorException('A path set is required for collecting columns')
+
+        self.paths = tuple(path_set) + (('obj',) if include_mors else ())
+        self.include_mors = include_mors
+        self._columns = dict((path, _Column()) for path in path_set)
+        self._obj = []
+        self._length = 0
+
+    def add(self, obj_content):
+        """
+        Add the properties of a managed object as a new row
+
+        Args:
+            obj_content (vmodl.query.PropertyCollector.ObjectContent): The object content
+
+        """
+        columns = self._columns
+        for prop in obj_content.propSet:
+            column = columns.get(prop.name)
+            if column is not None:
+                # Pad properties missing in previous rows
+                if self._length and (column.values is None or len(column.values) < self._length):
+                    column.pad(self._length)
+                column.append(prop.val)
+
+        self._length += 1
+        if self.include_mors:
+            self._obj.append(obj_content.obj)
+
+    def build(self):
+        """
+        Build the table from the added rows
+
+        Returns:
+            A PropertyTable instance
+
+        """
+        columns = {}
+        for path, column in self._columns.items():
+            if column.values is None or len(column.values) < self._length:
+                column.pad(self._length)
+            columns[path] = column.values
+
+        if self.include_mors:
+            columns['obj'] = self._obj
+
+        return PropertyTable(self.paths, columns, self._length)
+
+
+_record_classes = {}
+
+
+def record_class(path_set, include_mors=False):
+    """
+    Get a class with __slots__ for storing the properties of managed objects
+
+    The attribute names are the property paths with all characters
+    which are not valid in identifiers replaced by an underscore,
+    e.g. 'runtime.powerState' is stored as 'runtime_powerState'.
+    Record classes are cached and shared by all callers using the
+    same path set.
+
+    Args:
+        path_set     (list): List of property paths
+        include_mors (bool): If True add an 'obj' attribute for the managed object ref
+
+    Returns:
+        A record class, which is instantiated with the property
+        values in path set order as positional arguments
+
+    """
+    key = (tuple(path_set), include_mors)
+    cls = _record_classes.get(key)
+    if cls is not None:
+        return cls
+
+    fields = [re.sub(r'\W', '_', path) for path in path_set]
+    if include_mors:
+        fields.append('obj')
+
+    if len(set(fields)) != len(fields):
+        raise VConnectorException('Property paths map to duplicate record attributes')
+
+    def __init__(self, *values):
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        return 'Record({})'.format(
+            ', '.join('{}={!r}'.format(f, getattr(self, f)) for f in fields)
+        )
+
+    cls = type('Record', (object,), {
+        '__slots__': tuple(fields),
+        '__init__': __init__,
+        '__repr__': __repr__,
+        'paths': tuple(path_set),
+        'fields': tuple(fields),
+    })
+    _record_classes[key] = cls
+
+    return cls
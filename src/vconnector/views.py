@@ -0,0 +1,294 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+The vConnector views module
+
+"""
+
+import logging
+import threading
+import contextlib
+
+from time import time
+
+__all__ = ['ContainerViewPool']
+
+
+class _PooledView(object):
+    def __init__(self, key, view_ref):
+        """
+        Initializes a new pooled view
+
+        Args:
+            key                (tuple): Key of the view in the pool
+            view_ref (vim.view.ContainerView): The container view ref
+
+        """
+        self.key = key
+        self.view_ref = view_ref
+        self.refcount = 0
+        self.last_used = time()
+        self.error = None
+        self.ready = threading.Event()
+
+
+class ContainerViewPool(object):
+    """
+    Pool of reusable container views
+
+    Container views are kept in the pool keyed by their container,
+    managed object types and recursive flag, so that repeated
+    requests for the same view share a single server-side view.
+
+    Views which are not in use are destroyed once they have been
+    idle for 'idle_timeout' seconds. With an idle timeout of zero
+    views are destroyed as soon as they are no longer in use, so
+    views are reused only by concurrent requests.
+
+    Views are created and destroyed without holding the pool lock,
+    so that slow calls to the vSphere host do not block other
+    threads using the pool.
+
+    The idle views reaper runs only while there are views in the
+    pool and is stopped by clear() and invalidate().
+
+    """
+    def __init__(self, agent, idle_timeout=60):
+        """
+        Initializes a new ContainerViewPool object
+
+        Args:
+            agent  (VConnector): A VConnector instance
+            idle_timeout  (int): Time in seconds after which a view
+                                 which is not in use is destroyed
+
+        """
+        self.agent = agent
+        self.idle_timeout = idle_timeout
+        self.lock = threading.RLock()
+        self._views = {}
+        self._reaper_timer = None
+
+    def __len__(self):
+        with self.lock:
+            return len(self._views)
+
+    def _schedule_reaper(self):
+        """
+        Schedules the next run of the idle views reaper
+
+        The reaper is scheduled only if it is not scheduled
+        yet and there are views in the pool.
+
+        """
+        with self.lock:
+            if self.idle_timeout <= 0 or self._reaper_timer is not None or not self._views:
+                return
+
+            t = threading.Timer(
+                interval=self.idle_timeout,
+                function=self._reaper
+            )
+            t.daemon = True
+            t.start()
+            self._reaper_timer = t
+
+    def _cancel_reaper(self):
+        """
+        Cancels the next run of the idle views reaper
+
+        """
+        with self.lock:
+            if self._reaper_timer is not None:
+                self._reaper_timer.cancel()
+                self._reaper_timer = None
+
+    def _reaper(self):
+        """
+        Destroy the views which have been idle for too long
+
+        """
+        try:
+            self.destroy_idle(self.idle_timeout)
+        finally:
+            with self.lock:
+                self._reaper_timer = None
+            self._schedule_reaper()
+
+    def _destroy(self, pooled):
+        """
+        Destroy a pooled view, logging any errors
+
+        """
+        logging.debug(
+            '[%s] Destroying pooled container view %s',
+            self.agent.host,
+            pooled.view_ref
+        )
+        try:
+            pooled.view_ref.DestroyView()
+        except Exception as e:
+            logging.warning(
+                '[%s] Cannot destroy container view: %s',
+                self.agent.host,
+                e
+            )
+
+    def _acquire(self, key, obj_type, container, recursive):
+        with self.lock:
+            pooled = self._views.get(key)
+            creator = pooled is None
+            if creator:
+                # Reserve the view, so that concurrent requests wait for it
+                pooled = _PooledView(key, None)
+                self._views[key] = pooled
+            pooled.refcount += 1
+
+        if not creator:
+            pooled.ready.wait()
+            if pooled.error is not None:
+                raise pooled.error
+            return pooled
+
+        try:
+            pooled.view_ref = self.agent.get_container_view(
+                obj_type=list(obj_type),
+                container=container,
+                recursive=recursive
+            )
+        except Exception as e:
+            pooled.error = e
+            with self.lock:
+                if self._views.get(key) is pooled:
+                    self._views.pop(key)
+            raise
+        finally:
+            pooled.ready.set()
+
+        return pooled
+
+    def _release(self, pooled):
+        with self.lock:
+            pooled.refcount -= 1
+            pooled.last_used = time()
+
+            if self._views.get(pooled.key) is not pooled:
+                # The view has been invalidated while in use
+                return
+
+            if pooled.refcount > 0:
+                return
+
+            if self.idle_timeout > 0:
+                self._schedule_reaper()
+                return
+
+            self._views.pop(pooled.key)
+
+        self._destroy(pooled)
+
+    @contextlib.contextmanager
+    def view(self, obj_type, container=None, recursive=True):
+        """
+        Get a container view from the pool
+
+        The view is returned to the pool when the context exits.
+
+        Args:
+            obj_type               (list): A list of managed object types
+            container (vim.ManagedEntity): Starting point of inventory search
+            recursive              (bool): If True search recursively
+
+        Yields:
+            A container view ref to the discovered managed objects
+
+        """
+        key = (
+            container._moId if container is not None else None,
+            tuple(obj_type),
+            recursive
+        )
+
+        pooled = self._acquire(key, obj_type, container, recursive)
+        try:
+            yield pooled.view_ref
+        finally:
+            self._release(pooled)
+
+    def destroy_idle(self, idle_timeout=0):
+        """
+        Destroy the views which are not in use
+
+        Args:
+            idle_timeout (int): Destroy only views which have been
+                                idle for at least this many seconds
+
+        Returns:
+            The number of destroyed views
+
+        """
+        now = time()
+        with self.lock:
+            idle = [
+                pooled for pooled in self._views.values()
+                if pooled.refcount == 0 and pooled.view_ref is not None
+                and now - pooled.last_used >= idle_timeout
+            ]
+            for pooled in idle:
+                self._views.pop(pooled.key)
+
+        for pooled in idle:
+            self._destroy(pooled)
+
+        return len(idle)
+
+    def clear(self):
+        """
+        Destroy all views in the pool
+
+        Views which are still in use are removed from the pool
+        and destroyed as well.
+
+        """
+        with self.lock:
+            views = list(self._views.values())
+            self._views.clear()
+            self._cancel_reaper()
+
+        for pooled in views:
+            if pooled.view_ref is not None:
+                self._destroy(pooled)
+
+    def invalidate(self):
+        """
+        Forget all views in the pool without destroying them
+
+        Used after reconnecting to the vSphere host, when the views
+        created by the previous session no longer exist.
+
+        """
+        with self.lock:
+            self._views.clear()
+            self._cancel_reaper()
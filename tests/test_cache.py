@@ -0,0 +1,115 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Tests for the vConnector caching module
+
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+import pyVmomi
+
+from vconnector.core import VConnector
+
+
+class CacheStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.agent = VConnector(user='user', pwd='pwd', host='host', cache_enabled=True)
+        self.lookups = []
+
+        def find(property_name, property_value, obj_type):
+            self.lookups.append(property_value)
+            return None if property_value == 'missing' else 'obj-' + property_value
+
+        self.agent._find_object_by_property = find
+
+    def lookup(self, value):
+        return self.agent.get_object_by_property(
+            property_name='name',
+            property_value=value,
+            obj_type=pyVmomi.vim.VirtualMachine
+        )
+
+    def test_counts_each_lookup_once(self):
+        for value in ('vm1', 'vm2', 'vm3', 'vm1'):
+            self.lookup(value)
+
+        stats = self.agent.cache.get_stats()
+        self.assertEqual(stats['misses'], 3)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.25)
+        self.assertEqual(stats['hit_latency']['count'], 1)
+        self.assertEqual(stats['miss_latency']['count'], 3)
+        self.assertEqual(self.lookups, ['vm1', 'vm2', 'vm3'])
+
+    def test_counts_negative_hits(self):
+        self.assertIsNone(self.lookup('missing'))
+        self.assertIsNone(self.lookup('missing'))
+
+        stats = self.agent.cache.get_stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['negative_hits'], 1)
+        self.assertEqual(stats['hit_ratio'], 0.5)
+
+    def test_counts_multiple_lookups(self):
+        self.lookup('vm1')
+        self.agent.cache.reset_stats()
+
+        def collect(**kwargs):
+            return iter([
+                {'name': 'vm1', 'obj': 'obj-vm1'},
+                {'name': 'vm2', 'obj': 'obj-vm2'},
+            ])
+
+        class View(object):
+            def __enter__(self):
+                return None
+
+            def __exit__(self, *exc_info):
+                return False
+
+        self.agent.iter_properties = collect
+        self.agent.container_view = lambda **kwargs: View()
+
+        result = self.agent.get_objects_by_property(
+            property_name='name',
+            property_values=['vm1', 'vm2', 'vm3'],
+            obj_type=pyVmomi.vim.VirtualMachine
+        )
+
+        self.assertEqual(result, {'vm1': 'obj-vm1', 'vm2': 'obj-vm2', 'vm3': None})
+        stats = self.agent.cache.get_stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 2)
+        self.assertEqual(stats['hit_latency']['count'], 1)
+        self.assertEqual(stats['miss_latency']['count'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+# Copyright (c) 2015 Marin Atanasov Nikolov <dnaeon@gmail.com>
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer
+#    in this position and unchanged.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in the
+#    documentation and/or other materials provided with the distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE AUTHOR(S) ``AS IS'' AND ANY EXPRESS OR
+# IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED WARRANTIES
+# OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE DISCLAIMED.
+# IN NO EVENT SHALL THE AUTHOR(S) BE LIABLE FOR ANY DIRECT, INDIRECT,
+# INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT
+# NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF
+# THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""
+Tests for the vConnector cache eviction policies
+
+Replays a skewed access pattern against a bounded cache inventory
+using each of the eviction policies and compares the hit rates.
+
+"""
+
+import os
+import sys
+import random
+import bisect
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from vconnector.cache import CachedObject
+from vconnector.cache import CacheInventory
+from vconnector.cache import NegativeCachedObject
+
+
+def zipf_workload(keys, accesses, exponent=1.0, seed=0):
+    """
+    Generate accesses to keys with Zipf distributed popularity
+
+    The popularity of the keys is shuffled, so that it does not
+    follow the order in which the keys are first accessed.
+
+    """
+    rnd = random.Random(seed)
+    ranked = list(range(keys))
+    rnd.shuffle(ranked)
+
+    cumulative = []
+    total = 0.0
+    for rank in range(1, keys + 1):
+        total += 1.0 / rank ** exponent
+        cumulative.append(total)
+
+    return [
+        ranked[bisect.bisect_left(cumulative, rnd.random() * total)]
+        for _ in range(accesses)
+    ]
+
+
+def hit_rate(policy, workload, maxsize):
+    """
+    Replay a workload against a cache inventory and get the hit rate
+
+    Missing items are added to the cache after each miss.
+
+    """
+    cache = CacheInventory(maxsize=maxsize, policy=policy)
+    hits = 0
+
+    for key in workload:
+        name = 'key-{}'.format(key)
+        if cache.get(name) is not None:
+            hits += 1
+            continue
+
+        cache.add(CachedObject(name=name, obj=name, ttl=3600))
+
+    return float(hits) / len(workload)
+
+
+class EvictionPolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.workload = zipf_workload(keys=10000, accesses=50000)
+
+    def test_hit_rate_order(self):
+        rates = dict(
+            (policy, hit_rate(policy, self.workload, maxsize=500))
+            for policy in ('fifo', 'lru', 'lfu', 'size')
+        )
+
+        # Frequency matters most for a skewed access pattern
+        self.assertGreater(rates['lfu'], rates['lru'])
+        self.assertGreater(rates['lru'], rates['fifo'])
+        # Objects of the same size are evicted in LRU order
+        self.assertAlmostEqual(rates['size'], rates['lru'], places=2)
+
+    def test_size_evicts_negative_entries_first(self):
+        cache = CacheInventory(maxsize=3, policy='size')
+        cache.add(NegativeCachedObject(name='n1', ttl=3600))
+        cache.add(NegativeCachedObject(name='n2', ttl=3600))
+        cache.add(CachedObject(name='p1', obj=object(), ttl=3600))
+        cache.add(CachedObject(name='p2', obj=object(), ttl=3600))
+
+        self.assertIn('p1', cache)
+        self.assertIn('p2', cache)
+        self.assertNotIn('n1', cache)
+        self.assertIn('n2', cache)
+
+
+if __name__ == '__main__':
+    unittest.main()